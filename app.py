@@ -1,4 +1,6 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for
+from flask import (Flask, Response, render_template, request, jsonify, redirect, url_for, send_file,
+                   make_response, has_request_context)
+from functools import wraps
 import json
 import re
 import os
@@ -6,13 +8,22 @@ import subprocess
 from datetime import datetime
 from werkzeug.utils import secure_filename
 import hashlib
-from PIL import Image
 import time
-from threading import Thread
+from threading import Thread, Lock
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import uuid
-import fitz  # PyMuPDF - works on any hosting
-import easyocr  # Free OCR - works on any hosting
 import io
+import multiprocessing
+from extraction import (RULES_VERSION, place_gazetteer, match_page_places, extract_page_fields,
+                        extract_record, extract_records, extract_date_of_birth, extract_occupation_place,
+                        extract_native_address, extract_salary, extract_birth_year, extract_salary_band)
+from page_index import PageIndex, make_snippet
+from profiling import (PROFILING, PROFILE_TOKEN, token_ok, wants_profile, profile_call, list_profiles,
+                       profile_path, profile_report)
+from tiles import pyramid_info, start_pyramid_build, remove_pyramid, tile_path, preview_path
+from page_store import (load_page_data, save_page_data, next_page_id, page_image_path,
+                        load_pdf_registry, save_pdf_registry, file_sha256,
+                        IngestCheckpoint, acquire_lock, release_lock, store_lock, claim_store, StoreInUse)
 
 def get_image_hash(image_path):
     """Generate hash of image for duplicate detection"""
@@ -23,16 +34,20 @@ app = Flask(__name__)
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024  # 100MB max file size
 
+# SEARCH_ONLY=1 serves search and page views only: uploads, deletes and batch
+# operations are refused and the OCR/rendering stack (PyMuPDF, EasyOCR/torch,
+# PIL) is never imported. In the default mode it is imported when ingest runs.
+SEARCH_ONLY = os.getenv('SEARCH_ONLY') == '1'
+
 # Create directories
 os.makedirs('uploads', exist_ok=True)
 os.makedirs('static/pages', exist_ok=True)
 
 # Load page data
-try:
-    with open('page_data.json', 'r', encoding='utf-8') as f:
-        page_data = json.load(f)
-except FileNotFoundError:
-    page_data = {}
+page_data = load_page_data()
+
+for _data in page_data.values():
+    match_page_places(_data)
 
 # Poppler path
 POPPLER_PATH = r'C:\poppler-25.07.0\Library\bin'
@@ -40,176 +55,237 @@ POPPLER_PATH = r'C:\poppler-25.07.0\Library\bin'
 # Store upload progress
 upload_progress = {}
 
-# Initialize EasyOCR once globally (faster)
-reader = None
+# PDFs already ingested, keyed by SHA-256
+ingested_pdfs = load_pdf_registry()
+
+# Uploads commit to page_data.json every few pages and keep a checkpoint in
+# uploads/<upload_id>.checkpoint.json, so a crash or restart loses at most one batch
+UPLOAD_COMMIT_EVERY = int(os.getenv('UPLOAD_COMMIT_EVERY', '5'))
+MAX_RESUME_ATTEMPTS = 3  # An upload that keeps failing is given up after this many restarts
+
+# File locks of the uploads this process is working on: upload_id -> handle
+upload_locks = {}
 
-def get_ocr_reader():
-    global reader
-    if reader is None:
-        reader = easyocr.Reader(['en'], gpu=False)  # CPU only for compatibility
-    return reader
+# Server-Sent Events: how often a stream checks its upload for news, and the keep-alive interval
+UPLOAD_EVENTS_POLL_INTERVAL = 0.25
+UPLOAD_EVENTS_HEARTBEAT = 15
 
-def extract_text_hybrid(image_path):
-    """Use Tesseract locally, EasyOCR for deployment"""
+def start_native_thread(target, *args):
+    """Run target on an OS thread, even under gunicorn's gevent worker
+
+    Rendering and OCR hold the CPU inside C code; as a greenlet they would
+    stall every event stream and request served by the worker.
+    """
     try:
-        # Try Tesseract first (faster locally)
-        import pytesseract
-        pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
-        
-        img = Image.open(image_path)
-        img = img.convert('L')
-        config = '--oem 3 --psm 6 -c tessedit_char_whitelist=0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz.,/-: '
-        text = pytesseract.image_to_string(img, config=config)
-        return ' '.join(text.split())
-    except:
-        # Fallback to EasyOCR (for deployment)
-        reader = get_ocr_reader()
-        ocr_results = reader.readtext(image_path, 
-                                    width_ths=0.7,
-                                    height_ths=0.7,
-                                    paragraph=False)
-        text = ' '.join([result[1] for result in ocr_results if result[2] > 0.5])
-        return ' '.join(text.split())
-
-def extract_date_of_birth(text):
-    """Extract date of birth from text with enhanced patterns"""
-    patterns = [
-        r'date\s*of\s*birth[:\s]*([0-9]{1,2}[-/.][0-9]{1,2}[-/.][0-9]{4})',
-        r'dob[:\s]*([0-9]{1,2}[-/.][0-9]{1,2}[-/.][0-9]{4})',
-        r'birth[:\s]*([0-9]{1,2}[-/.][0-9]{1,2}[-/.][0-9]{4})',
-        r'born[:\s]*([0-9]{1,2}[-/.][0-9]{1,2}[-/.][0-9]{4})',
-        r'([0-9]{1,2}[-/.][0-9]{1,2}[-/.]19[0-9]{2})',
-        r'([0-9]{1,2}[-/.][0-9]{1,2}[-/.]20[0-9]{2})',
-        r'([0-9]{1,2}\s*[-/.]\s*[0-9]{1,2}\s*[-/.]\s*[0-9]{4})',
-        r'([0-9]{1,2}[th|st|nd|rd]*\s*[a-zA-Z]+\s*[0-9]{4})'
-    ]
-    
-    text_lower = text.lower()
-    for pattern in patterns:
-        matches = re.findall(pattern, text_lower, re.IGNORECASE)
-        for match in matches:
-            # Normalize date format
-            date_str = re.sub(r'[^0-9/\-.]', '', match)
-            if len(date_str.split('/')) == 3 or len(date_str.split('-')) == 3 or len(date_str.split('.')) == 3:
-                return date_str
-    return None
+        from gevent import monkey
+        if monkey.is_module_patched('threading'):
+            monkey.get_original('_thread', 'start_new_thread')(target, args)
+            return
+    except ImportError:
+        pass
+    Thread(target=target, args=args).start()
 
-def extract_occupation_place(text):
-    """Extract place of work/occupation from text with enhanced patterns"""
-    patterns = [
-        r'working\s+(?:at|in|for)\s+([a-zA-Z0-9\s,.-]+?)(?:[,.]|\n|$)',
-        r'company[:\s]*([a-zA-Z0-9\s,.-]+?)(?:[,.]|\n|$)',
-        r'organization[:\s]*([a-zA-Z0-9\s,.-]+?)(?:[,.]|\n|$)',
-        r'employer[:\s]*([a-zA-Z0-9\s,.-]+?)(?:[,.]|\n|$)',
-        r'occupation[:\s]*([a-zA-Z0-9\s,.-]+?)(?:[,.]|\n|$)',
-        r'job[:\s]*([a-zA-Z0-9\s,.-]+?)(?:[,.]|\n|$)',
-        r'profession[:\s]*([a-zA-Z0-9\s,.-]+?)(?:[,.]|\n|$)',
-        r'place\s*of\s*work[:\s]*([a-zA-Z0-9\s,.-]+?)(?:[,.]|\n|$)',
-        r'current\s*location[:\s]*([a-zA-Z0-9\s,.-]+?)(?:[,.]|\n|$)',
-        r'(?:hyderabad|bangalore|chennai|mumbai|delhi|pune|kolkata|ahmedabad|surat|jaipur|lucknow|kanpur|nagpur|visakhapatnam|indore|thane|bhopal|patna|vadodara|ghaziabad|ludhiana|agra|nashik|faridabad|meerut|rajkot|kalyan|vasai|varanasi|srinagar|aurangabad|dhanbad|amritsar|navi mumbai|allahabad|ranchi|howrah|coimbatore|jabalpur|gwalior|vijayawada|jodhpur|madurai|raipur|kota|guwahati|chandigarh|solapur|hubli|tiruchirappalli|bareilly|mysore|tiruppur|gurgaon|aligarh|jalandhar|bhubaneswar|salem|warangal|guntur|bhiwandi|saharanpur|gorakhpur|bikaner|amravati|noida|jamshedpur|bhilai|cuttack|firozabad|kochi|nellore|bhavnagar|dehradun|durgapur|asansol|rourkela|nanded|kolhapur|ajmer|akola|gulbarga|jamnagar|ujjain|loni|siliguri|jhansi|ulhasnagar|jammu|sangli|miraj|kupwad|belgaum|mangalore|ambattur|tirunelveli|malegaon|gaya|jalgaon|udaipur|maheshtala)(?:\s|,|\.|$)'
-    ]
-    
-    text_lower = text.lower()
-    for pattern in patterns:
-        matches = re.findall(pattern, text_lower, re.IGNORECASE)
-        for match in matches:
-            if isinstance(match, str) and len(match.strip()) > 2:
-                return match.strip().title()
-    return None
+def process_pool_context():
+    """Start method for process pools run from the app; None means the platform default
 
-def extract_native_address(text):
-    """Extract native place/address from text with enhanced patterns"""
-    patterns = [
-        r'native[:\s]*([a-zA-Z0-9\s,.-]+?)(?:[,.]|\n|$)',
-        r'native\s*place[:\s]*([a-zA-Z0-9\s,.-]+?)(?:[,.]|\n|$)',
-        r'home\s*town[:\s]*([a-zA-Z0-9\s,.-]+?)(?:[,.]|\n|$)',
-        r'birth\s*place[:\s]*([a-zA-Z0-9\s,.-]+?)(?:[,.]|\n|$)',
-        r'place\s*of\s*birth[:\s]*([a-zA-Z0-9\s,.-]+?)(?:[,.]|\n|$)',
-        r'residential\s*address[:\s]*([a-zA-Z0-9\s,.-]+?)(?:\n|contact|phone|mobile)',
-        r'permanent\s*address[:\s]*([a-zA-Z0-9\s,.-]+?)(?:\n|contact|phone|mobile)',
-        r'address[:\s]*([a-zA-Z0-9\s,.-]+?)(?:\n|contact|phone|mobile)',
-        r'settled\s*(?:in|at)[:\s]*([a-zA-Z0-9\s,.-]+?)(?:[,.]|\n|$)'
-    ]
-    
-    text_lower = text.lower()
-    for pattern in patterns:
-        matches = re.findall(pattern, text_lower, re.IGNORECASE)
-        for match in matches:
-            if isinstance(match, str) and len(match.strip()) > 2:
-                return match.strip().title()
+    Under gevent a fork from an OS thread fails on gevent's child watchers,
+    so workers are spawned instead.
+    """
+    try:
+        from gevent import monkey
+        if monkey.is_module_patched('os'):
+            return multiprocessing.get_context('spawn')
+    except ImportError:
+        pass
     return None
 
-def extract_salary(text):
-    """Extract salary information from text with enhanced patterns"""
-    patterns = [
-        r'salary[:\s]*(\d+(?:\.\d+)?)\s*(?:lakhs?|lpa|k|crores?|thousands?)',
-        r'income[:\s]*(\d+(?:\.\d+)?)\s*(?:lakhs?|lpa|k|crores?|thousands?)',
-        r'package[:\s]*(\d+(?:\.\d+)?)\s*(?:lakhs?|lpa|k|crores?|thousands?)',
-        r'annual\s*(?:income|salary|package)[:\s]*(\d+(?:\.\d+)?)\s*(?:lakhs?|lpa|k|crores?|thousands?)',
-        r'ctc[:\s]*(\d+(?:\.\d+)?)\s*(?:lakhs?|lpa|k|crores?|thousands?)',
-        r'(\d+(?:\.\d+)?)\s*(?:lakhs?|lpa|k|crores?)\s*(?:per\s*annum|pa|annually)',
-        r'earning[:\s]*(\d+(?:\.\d+)?)\s*(?:lakhs?|lpa|k|crores?|thousands?)',
-        r'\$\s*(\d+(?:,\d{3})*(?:\.\d+)?)\s*(?:k|thousand|per\s*year|annually)?',
-        r'(\d+(?:\.\d+)?)\s*(?:thousand|k)\s*(?:usd|dollars?|per\s*month)'
-    ]
-    
-    text_lower = text.lower()
-    for pattern in patterns:
-        matches = re.findall(pattern, text_lower, re.IGNORECASE)
-        for match in matches:
-            if isinstance(match, str) and match.strip():
-                return match.strip()
-    return None
+def publish_progress(progress, **changes):
+    """Update an upload's progress and let its event streams know"""
+    progress.update(changes)
+    progress['seq'] = progress.get('seq', 0) + 1
+
+# Chunked uploads: session metadata and partial files live here, so any worker can resume them
+CHUNKED_UPLOAD_FOLDER = os.path.join('uploads', 'chunks')
+CHUNK_READ_SIZE = 64 * 1024
+CHUNKED_UPLOAD_TTL = 24 * 3600  # Abandoned partial uploads are removed after a day
+os.makedirs(CHUNKED_UPLOAD_FOLDER, exist_ok=True)
+
+# Running SHA-256 of each chunked upload: session_id -> (offset, hasher)
+upload_hashers = {}
+
+# Extracted fields are stored with each page, tagged with the RULES_VERSION they were
+# extracted under. Pages tagged with older rules are re-extracted in the background
+# (REEXTRACT_ON_START) by a process pool, in chunks of REEXTRACT_CHUNK pages.
+REEXTRACT_ON_START = os.getenv('REEXTRACT_ON_START', '1') == '1'
+REEXTRACT_WORKERS = int(os.getenv('REEXTRACT_WORKERS', '0')) or None  # 0 = CPU count
+REEXTRACT_CHUNK = 200
+
+def stored_page_fields(data):
+    """Fields stored with a page, even from older rules; extracted now if it has none"""
+    return data.get('fields') or extract_page_fields(data)
+
+def refresh_page_fields(data):
+    """Re-run place matching and field extraction over a page's text under the current rules"""
+    data['places'], data['fields'] = extract_record(data['text'])
+    data['rules_version'] = RULES_VERSION
+
+# Extracted fields and facet bitmaps over page ordinals
+page_index = PageIndex(stored_page_fields)
+for _page_id, _data in page_data.items():
+    page_index.add(_page_id, _data)
+
+# Cached image hashes and word sets of stored pages for duplicate detection
+_dedupe_cache = {}
+
+def _dedupe_entry(page_id, data):
+    entry = _dedupe_cache.get(page_id)
+    if entry is None or entry[0] is not data:
+        image_path = page_image_path(page_id)
+        image_hash = data.get('image_hash') or (get_image_hash(image_path) if os.path.exists(image_path) else None)
+        words = data['text'].lower().split()
+        entry = _dedupe_cache[page_id] = (data, image_hash, set(words), len(data['text'].split()))
+    return entry
+
+# Fingerprints (fingerprint.py) of the PDF pages each stored page was filed from or
+# found to duplicate, so a repeat of one is skipped before it is rendered
+fingerprint_index = {}
+for _page_id, _data in page_data.items():
+    for _fingerprint in _data.get('fingerprints', ()):
+        fingerprint_index[_fingerprint] = _page_id
+
+def find_fingerprint(fingerprint):
+    """Return the stored page a PDF page with this fingerprint was filed as, or None"""
+    page_id = fingerprint_index.get(fingerprint)
+    if page_id is None:
+        return None
+    data = page_data.get(page_id)
+    # Deleted pages, and IDs reused since, leave stale entries behind
+    if data is None or fingerprint not in data.get('fingerprints', ()) or not os.path.exists(page_image_path(page_id)):
+        del fingerprint_index[fingerprint]
+        return None
+    return page_id
+
+def note_fingerprint(page_id, fingerprint):
+    """Remember that a PDF page with this fingerprint is stored as page_id"""
+    if not fingerprint:
+        return
+    fingerprints = page_data[page_id].setdefault('fingerprints', [])
+    if fingerprint not in fingerprints:
+        fingerprints.append(fingerprint)
+    fingerprint_index[fingerprint] = page_id
+
+def find_duplicate(text, image_hash):
+    """Return (page_id, reason) of a stored page this page duplicates, or (None, None)"""
+    words = set(text.lower().split())
+    word_count = len(text.split())
+    for existing_id, existing_data in list(page_data.items()):
+        if not os.path.exists(page_image_path(existing_id)):
+            continue
+        _, existing_hash, existing_words, existing_count = _dedupe_entry(existing_id, existing_data)
+        if existing_hash == image_hash:
+            return existing_id, "IDENTICAL IMAGE"
+        text_similarity = len(words & existing_words) / max(word_count, existing_count, 1)
+        if text_similarity > 0.9:
+            return existing_id, f"SAME TEXT ({int(text_similarity*100)}% match)"
+    return None, None
+
+def build_page_record(text, filename, page_num, image_hash):
+    """Store record for a newly ingested page"""
+    record = {
+        'text': text,
+        'original_text': text,
+        'source_pdf': filename,
+        'local_page': int(page_num),
+        'image_hash': image_hash
+    }
+    refresh_page_fields(record)
+    return record
+
+def filter_pages(query, dob_filter, place_filter, salary_filter):
+    """Return the ordinal mask of pages matching the search filters"""
+    # Known places (and their aliases) resolve to a place bitmap
+    place = place_gazetteer.canonical(place_filter) if place_filter else None
+    return page_index.filter_mask(query, dob_filter, place_filter, salary_filter, place=place)
+
+def profile_header():
+    return request.headers.get('X-Profile') or request.args.get('profile')
+
+def profile_requested():
+    """Whether this request asks to be profiled (X-Profile header or ?profile=)"""
+    return wants_profile(profile_header())
+
+def profile_view(label):
+    """Profile a view when PROFILING is on and the request asks for it; the view itself otherwise"""
+    def decorate(view):
+        if not PROFILING:
+            return view
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not profile_requested():
+                return view(*args, **kwargs)
+            response, name = profile_call(label, view, *args, **kwargs)
+            response = make_response(response)
+            if name:
+                response.headers['X-Profile-File'] = name
+            return response
+        return wrapper
+    return decorate
 
 @app.route('/')
 def index():
-    return render_template('index.html')
+    return render_template('index.html', search_only=SEARCH_ONLY)
 
 @app.route('/search')
+@profile_view('search')
 def search():
     query = request.args.get('q', '').lower()
     dob_filter = request.args.get('dob', '')
     place_filter = request.args.get('place', '').lower()
     salary_filter = request.args.get('salary', '')
+    with_snippets = request.args.get('snippets') == '1'
     
     results = []
-    
-    for page_id, data in page_data.items():
-        text = data['text'].lower()
-        
-        # Text search
-        if query and query not in text:
+    mask = filter_pages(query, dob_filter, place_filter, salary_filter)
+    page_ids = page_index.page_ids_for(mask)
+    # Where q occurs in each page, from the word offsets kept in the index
+    offsets = page_index.match_offsets(page_ids, query) if with_snippets and query.strip() else {}
+    for page_id in page_ids:
+        fields = page_index.get(page_id)
+        if fields is None:
             continue
-            
-        # DOB filter
-        if dob_filter:
-            page_dob = extract_date_of_birth(text)
-            if not page_dob or dob_filter not in page_dob:
-                continue
-                
-        # Place filter (search in both occupation place and native address)
-        if place_filter:
-            occ_place = extract_occupation_place(text) or ''
-            native_addr = extract_native_address(text) or ''
-            if place_filter not in occ_place.lower() and place_filter not in native_addr.lower():
-                continue
-                
-        # Salary filter
-        if salary_filter:
-            page_salary = extract_salary(text)
-            if not page_salary or salary_filter not in page_salary:
-                continue
-        
-        results.append({
+        result = {
             'page_id': page_id,
             'image_path': f'static/pages/page_{page_id}.png',
-            'dob': extract_date_of_birth(text),
-            'occupation_place': extract_occupation_place(text),
-            'native_address': extract_native_address(text)
-        })
+            'dob': fields['dob'],
+            'occupation_place': fields['occupation_place'],
+            'native_address': fields['native_address']
+        }
+        if offsets.get(page_id) is not None:
+            text = page_data[page_id]['text']
+            lowered = page_index.text(page_id)
+            # Offsets are into the lowercase text; use it where case folding changed the length
+            result['snippet'] = make_snippet(text if len(text) == len(lowered) else lowered,
+                                             offsets[page_id], query)
+        results.append(result)
     
     return jsonify(results)
 
+@app.route('/facets')
+def facets():
+    """Counts per place, birth year and salary band for the current filters"""
+    query = request.args.get('q', '').lower()
+    dob_filter = request.args.get('dob', '')
+    place_filter = request.args.get('place', '').lower()
+    salary_filter = request.args.get('salary', '')
+    limit = request.args.get('limit', type=int)
+    
+    mask = filter_pages(query, dob_filter, place_filter, salary_filter)
+    
+    return jsonify({
+        'total': int(mask.sum()),
+        'facets': page_index.facet_counts(mask, limit=limit)
+    })
+
 @app.route('/page/<page_id>')
 def view_page(page_id):
     if page_id in page_data:
@@ -220,6 +296,111 @@ def view_page(page_id):
                              image_path=f'static/pages/page_{page_id}.png')
     return "Page not found", 404
 
+# page_pyramid's answer while a page's pyramid is still being built
+PYRAMID_BUILDING = 'building'
+
+def page_pyramid(page_id):
+    """Tile pyramid info for a page; None if the page has no image
+
+    The first request starts building the pyramid on an OS thread and gets
+    PYRAMID_BUILDING until it is done: resizing and encoding every level
+    holds the CPU, and in a request it would stall the whole gevent worker.
+    """
+    image_path = page_image_path(page_id)
+    if page_id not in page_data or not os.path.exists(image_path):
+        return None
+    info = pyramid_info(page_id, image_path)
+    if info is None:
+        start_pyramid_build(page_id, image_path, start_native_thread)
+        return PYRAMID_BUILDING
+    return info
+
+def pyramid_building_response():
+    response = jsonify({'status': PYRAMID_BUILDING})
+    response.status_code = 202
+    response.headers['Retry-After'] = '1'
+    return response
+
+@app.route('/page/<page_id>/tiles.json')
+def page_tiles_info(page_id):
+    """Image size and per-level sizes of a page's deep-zoom pyramid; 202 while it is built"""
+    info = page_pyramid(page_id)
+    if info is None:
+        return jsonify({'error': 'Page not found'}), 404
+    if info == PYRAMID_BUILDING:
+        return pyramid_building_response()
+    return jsonify(info)
+
+@app.route('/page/<page_id>/preview.jpg')
+def page_preview(page_id):
+    info = page_pyramid(page_id)
+    if info is None:
+        return "Page not found", 404
+    if info == PYRAMID_BUILDING:
+        # The page image itself stands in until the preview exists; not cached, so the preview replaces it
+        return send_file(page_image_path(page_id), mimetype='image/png', max_age=0)
+    return send_file(preview_path(page_id), mimetype='image/jpeg', max_age=3600)
+
+@app.route('/page/<page_id>/tiles/<int:level>/<int:x>_<int:y>.jpg')
+def page_tile(page_id, level, x, y):
+    info = page_pyramid(page_id)
+    if info is None:
+        return "Page not found", 404
+    if info == PYRAMID_BUILDING:
+        return pyramid_building_response()
+    path = tile_path(page_id, level, x, y)
+    if not os.path.exists(path):
+        return "Tile not found", 404
+    return send_file(path, mimetype='image/jpeg', max_age=3600)
+
+def find_duplicate_pdf(pdf_sha256):
+    """Return details of an ingested or in-progress PDF with the same SHA-256, or None"""
+    if pdf_sha256 in ingested_pdfs:
+        return ingested_pdfs[pdf_sha256]
+    for progress in list(upload_progress.values()):
+        if progress.get('pdf_sha256') == pdf_sha256 and progress['status'] not in ('completed', 'cancelled', 'error'):
+            return {'filename': progress['filename'], 'status': progress['status']}
+    return None
+
+def upload_checkpoint_path(upload_id):
+    return os.path.join(app.config['UPLOAD_FOLDER'], f'{upload_id}.checkpoint.json')
+
+def upload_lock_path(upload_id):
+    return os.path.join(app.config['UPLOAD_FOLDER'], f'{upload_id}.lock')
+
+def start_pdf_processing(filepath, filename, pdf_sha256, upload_id=None):
+    """Register an upload and start processing it in the background"""
+    # Generate unique upload ID
+    if upload_id is None:
+        upload_id = str(uuid.uuid4())
+        upload_locks[upload_id] = acquire_lock(upload_lock_path(upload_id))
+    upload_progress[upload_id] = {
+        'status': 'starting',
+        'progress': 0,
+        'total_pages': 0,
+        'processed_pages': 0,
+        'start_time': time.time(),
+        'cancelled': False,
+        'filepath': filepath,
+        'filename': filename,
+        'pdf_sha256': pdf_sha256
+    }
+    
+    # Start processing in background, profiled if the upload request asked for it
+    if PROFILING and has_request_context() and profile_requested():
+        start_native_thread(profile_upload, upload_id)
+    else:
+        start_native_thread(process_pdf_background, upload_id)
+    
+    return upload_id
+
+def profile_upload(upload_id):
+    _, name = profile_call('upload', process_pdf_background, upload_id)
+    upload_progress[upload_id]['profile_file'] = name
+
+def duplicate_pdf_response(duplicate):
+    return jsonify({'error': 'This PDF has already been uploaded', 'duplicate_of': duplicate}), 409
+
 @app.route('/upload', methods=['POST'])
 def upload_pdf():
     try:
@@ -237,190 +418,515 @@ def upload_pdf():
     filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
     file.save(filepath)
     
-    # Generate unique upload ID
-    upload_id = str(uuid.uuid4())
-    upload_progress[upload_id] = {
-        'status': 'starting',
-        'progress': 0,
-        'total_pages': 0,
-        'processed_pages': 0,
-        'start_time': time.time(),
-        'cancelled': False,
-        'filepath': filepath,
-        'filename': filename
-    }
+    # Reject byte-identical PDFs before any rendering or OCR
+    pdf_sha256 = file_sha256(filepath)
+    duplicate = find_duplicate_pdf(pdf_sha256)
+    if duplicate:
+        os.remove(filepath)
+        return duplicate_pdf_response(duplicate)
     
-    # Start processing in background
-    thread = Thread(target=process_pdf_background, args=(upload_id,))
-    thread.start()
+    return jsonify({'upload_id': start_pdf_processing(filepath, filename, pdf_sha256)})
+
+def chunked_upload_paths(session_id):
+    """(metadata, partial file) paths of a chunked upload, or None for a malformed ID"""
+    try:
+        session_id = str(uuid.UUID(session_id))
+    except ValueError:
+        return None
+    base = os.path.join(CHUNKED_UPLOAD_FOLDER, session_id)
+    return f'{base}.json', f'{base}.part'
+
+def load_chunked_upload(session_id):
+    paths = chunked_upload_paths(session_id)
+    if not paths or not os.path.exists(paths[0]):
+        return None, None
+    with open(paths[0], 'r', encoding='utf-8') as f:
+        return json.load(f), paths
+
+def chunked_upload_hasher(session_id, part_path):
+    """Running SHA-256 of the bytes received so far, rebuilt from disk if this worker lost it"""
+    offset = os.path.getsize(part_path)
+    cached = upload_hashers.get(session_id)
+    if cached and cached[0] == offset:
+        return cached[1]
+    hasher = hashlib.sha256()
+    with open(part_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_READ_SIZE), b''):
+            hasher.update(chunk)
+    upload_hashers[session_id] = (offset, hasher)
+    return hasher
+
+def purge_stale_chunked_uploads():
+    """Remove partial uploads nobody has touched within CHUNKED_UPLOAD_TTL"""
+    cutoff = time.time() - CHUNKED_UPLOAD_TTL
+    for name in os.listdir(CHUNKED_UPLOAD_FOLDER):
+        path = os.path.join(CHUNKED_UPLOAD_FOLDER, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                upload_hashers.pop(name.split('.')[0], None)
+        except OSError:
+            pass
+
+@app.route('/upload/chunked', methods=['POST'])
+def start_chunked_upload():
+    """Open a resumable upload; chunks are then PUT at increasing offsets"""
+    purge_stale_chunked_uploads()
+    info = request.get_json(silent=True) or {}
+    filename = secure_filename(info.get('filename', ''))
+    size = info.get('size')
+    if not filename.lower().endswith('.pdf'):
+        return jsonify({'error': 'Please select a PDF file'}), 400
+    if not isinstance(size, int) or size <= 0:
+        return jsonify({'error': 'File size is required'}), 400
+    if size > app.config['MAX_CONTENT_LENGTH']:
+        return jsonify({'error': 'File too large. Maximum size is 100MB'}), 413
+    
+    session_id = str(uuid.uuid4())
+    meta_path, part_path = chunked_upload_paths(session_id)
+    open(part_path, 'wb').close()
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump({'filename': filename, 'size': size, 'created': time.time()}, f)
+    upload_hashers[session_id] = (0, hashlib.sha256())
     
-    return jsonify({'upload_id': upload_id})
+    return jsonify({'session_id': session_id, 'offset': 0, 'size': size})
+
+@app.route('/upload/chunked/<session_id>', methods=['GET'])
+def chunked_upload_status(session_id):
+    """Offset to resume a chunked upload from"""
+    meta, paths = load_chunked_upload(session_id)
+    if not meta:
+        return jsonify({'error': 'Upload not found'}), 404
+    return jsonify({'session_id': session_id, 'offset': os.path.getsize(paths[1]), 'size': meta['size']})
+
+@app.route('/upload/chunked/<session_id>', methods=['PUT'])
+def upload_chunk(session_id):
+    """Append the request body at ?offset=N, streaming it to disk and into the SHA-256"""
+    meta, paths = load_chunked_upload(session_id)
+    if not meta:
+        return jsonify({'error': 'Upload not found'}), 404
+    meta_path, part_path = paths
+    
+    offset = os.path.getsize(part_path)
+    if request.args.get('offset', type=int) != offset:
+        # Client and server disagree (e.g. a chunk was lost); tell it where to resume
+        return jsonify({'error': 'Offset mismatch', 'offset': offset}), 409
+    
+    hasher = chunked_upload_hasher(session_id, part_path)
+    received = offset
+    with open(part_path, 'ab') as f:
+        while True:
+            chunk = request.stream.read(CHUNK_READ_SIZE)
+            if not chunk:
+                break
+            received += len(chunk)
+            if received > meta['size']:
+                f.truncate(offset)
+                upload_hashers.pop(session_id, None)
+                return jsonify({'error': 'More data than the declared file size', 'offset': offset}), 400
+            f.write(chunk)
+            hasher.update(chunk)
+    upload_hashers[session_id] = (received, hasher)
+    
+    if received < meta['size']:
+        return jsonify({'session_id': session_id, 'offset': received, 'size': meta['size']})
+    
+    # Last chunk: the hash is already complete, so duplicates never reach rendering or OCR
+    pdf_sha256 = hasher.hexdigest()
+    upload_hashers.pop(session_id, None)
+    os.remove(meta_path)
+    duplicate = find_duplicate_pdf(pdf_sha256)
+    if duplicate:
+        os.remove(part_path)
+        return duplicate_pdf_response(duplicate)
+    
+    filepath = os.path.join(app.config['UPLOAD_FOLDER'], f'{session_id}.pdf')
+    os.replace(part_path, filepath)
+    return jsonify({'upload_id': start_pdf_processing(filepath, meta['filename'], pdf_sha256)})
+
+@app.route('/upload/chunked/<session_id>', methods=['DELETE'])
+def abort_chunked_upload(session_id):
+    meta, paths = load_chunked_upload(session_id)
+    if not meta:
+        return jsonify({'error': 'Upload not found'}), 404
+    upload_hashers.pop(session_id, None)
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+    return jsonify({'success': True})
+
+def remove_pages(page_ids):
+    """Drop pages from page_data, the index and disk; the caller saves page_data"""
+    removed = []
+    for page_id in page_ids:
+        if page_id not in page_data:
+            continue
+        image_path = page_image_path(page_id)
+        if os.path.exists(image_path):
+            os.remove(image_path)
+        remove_pyramid(page_id)
+        page_index.remove(page_id)
+        _dedupe_cache.pop(page_id, None)
+        del page_data[page_id]
+        removed.append(page_id)
+    return removed
 
 def process_pdf_background(upload_id):
     global page_data, upload_progress
+    # The OCR and rendering stack loads with the first upload, not with the app
+    import fitz  # PyMuPDF - works on any hosting
+    from fingerprint import PAGE_FINGERPRINTS, FingerprintStats, page_costs, page_fingerprint
+    from ocr import OCR_TWO_PASS, extract_text_hybrid, extract_text_two_pass, get_ocr_reader
+    from render import RenderStats, render_page_to_file
+    
+    progress = upload_progress[upload_id]
+    checkpoint = IngestCheckpoint(upload_checkpoint_path(upload_id))
+    batch = []  # Page numbers processed since the last commit
+    
+    def stored_added_ids():
+        """This upload's pages still in the store, not IDs since deleted and given to other pages"""
+        return [page_id for page_id in added_ids
+                if page_id in page_data and page_data[page_id].get('source_pdf') == filename]
+    
+    def commit():
+        """Persist page_data, then record the batch as done in the checkpoint"""
+        if not batch:
+            return
+        save_page_data(page_data)
+        entry['done'].extend(batch)
+        checkpoint.pending = []
+        checkpoint.save()
+        batch.clear()
     
     try:
-        progress = upload_progress[upload_id]
-        progress['status'] = 'converting'
+        publish_progress(progress, status='converting')
         
         filepath = progress['filepath']
         filename = progress['filename']
         
+        # Images moved in by a crashed run but never committed would shift ID allocation
+        with store_lock:
+            removed = checkpoint.recover(page_data)
+        if removed:
+            print(f"🧹 Removed {len(removed)} uncommitted pages of upload {upload_id}")
+        checkpoint.meta.update({
+            'filepath': filepath,
+            'filename': filename,
+            'pdf_sha256': progress.get('pdf_sha256')
+        })
+        # Recovered IDs are free again and may go to another upload's pages
+        added_ids = checkpoint.meta.setdefault('added_ids', [])
+        added_ids[:] = [page_id for page_id in added_ids if page_id not in removed]
+        progress['duplicates_skipped'] = checkpoint.meta.get('duplicates_skipped', 0)
+        progress['high_res_pages'] = checkpoint.meta.get('high_res_pages', 0)
+        
         # Use PyMuPDF - works on any hosting (no system dependencies)
         doc = fitz.open(filepath)
+        entry = checkpoint.entry(filepath, len(doc))
+        checkpoint.save()
+        done = set(entry['done'])
         progress['total_pages'] = len(doc)
-        progress['status'] = 'processing'
+        progress['processed_pages'] = progress['resumed_pages'] = len(done)
+        publish_progress(progress, status='processing')
         
         # Use global OCR reader (faster)
         reader = get_ocr_reader()
         
-        image_files = []
-        for page_num in range(len(doc)):
+        # Render, OCR and file one page at a time so only a single page image exists at once
+        render_stats = RenderStats()
+        fingerprint_stats = FingerprintStats(page_costs)
+        image_digests = {}  # Shared images are hashed once per PDF
+        for i in range(len(doc)):
             if progress['cancelled']:
                 break
+            if i + 1 in done:
+                continue
                 
-            page = doc[page_num]
+            page_num = f'{i + 1:03d}'
+            old_path = os.path.join(app.config['UPLOAD_FOLDER'], f'{upload_id}-page-{page_num}.png')
             
-            # Convert page to high-quality image (300 DPI)
-            mat = fitz.Matrix(3.0, 3.0)  # 3x zoom = 300 DPI
-            pix = page.get_pixmap(matrix=mat)
+            # A page repeated from an earlier PDF is known before it is rendered
+            fingerprint = None
+            if PAGE_FINGERPRINTS:
+                start = time.perf_counter()
+                fingerprint = page_fingerprint(doc[i], image_digests)
+                fingerprint_stats.fingerprint_time += time.perf_counter() - start
+            with store_lock:
+                repeated_page_id = find_fingerprint(fingerprint) if fingerprint else None
             
-            # Save as PNG
-            temp_filename = f'page-{page_num + 1:03d}.png'
-            temp_path = os.path.join('static/pages', temp_filename)
-            pix.save(temp_path)
-            
-            image_files.append(temp_filename)
+            if repeated_page_id:
+                duplicate_page_id, duplicate_reason = repeated_page_id, "SAME PDF PAGE (fingerprint)"
+                fingerprint_stats.skipped += 1
+            else:
+                # Grayscale render within the memory budget (see render.py)
+                publish_progress(progress, stage='rendering', current_page=i + 1)
+                start, render_time = time.perf_counter(), render_stats.render_time
+                if OCR_TWO_PASS:
+                    # Rendered and OCR'd at low zoom, then at full zoom only if that read poorly
+                    publish_progress(progress, stage='ocr')
+                    try:
+                        text, high_res = extract_text_two_pass(doc[i], old_path, render_stats)
+                    except:
+                        text, high_res = f"Page from {filename} - {page_num}", False
+                    progress['high_res_pages'] += high_res
+                    checkpoint.meta['high_res_pages'] = progress['high_res_pages']
+                    image_hash = get_image_hash(old_path)
+                else:
+                    pixels = render_page_to_file(doc[i], old_path, render_stats, keep_pixels=True)
+                    
+                    # Process image
+                    image_hash = get_image_hash(old_path)
+                    
+                    publish_progress(progress, stage='ocr')
+                    try:
+                        # Use hybrid OCR (Tesseract locally, EasyOCR for deployment)
+                        text = extract_text_hybrid(old_path, pixels)
+                    except:
+                        text = f"Page from {filename} - {page_num}"
+                    pixels = None  # Only one page in memory at a time
+                render_time = render_stats.render_time - render_time
+                fingerprint_stats.add_processed(render_time, time.perf_counter() - start - render_time)
             
-            progress['processed_pages'] = page_num + 1
-            progress['progress'] = int((page_num + 1) / len(doc) * 100)
-        
-        doc.close()
-        progress['total_pages'] = len(image_files)
-        progress['status'] = 'processing'
-        
-        new_pages = 0
-        for i, img_file in enumerate(image_files):
-            if progress['cancelled']:
-                break
+            # Checking for duplicates and filing are one step, so concurrent uploads
+            # can neither both add the same page nor be given the same page ID
+            with store_lock:
+                if not repeated_page_id:
+                    # Strong duplicate detection
+                    duplicate_page_id, duplicate_reason = find_duplicate(text, image_hash)
+                is_duplicate = duplicate_page_id is not None
                 
-            page_num = img_file.split('-')[1].split('.')[0]
-            new_page_id = str(len(page_data) + new_pages + 1)
-            
-            while os.path.exists(f'static/pages/page_{new_page_id}.png'):
-                new_page_id = str(int(new_page_id) + 1)
-            
-            old_path = os.path.join('static/pages', img_file)
-            new_path = f'static/pages/page_{new_page_id}.png'
-            
-            # Process image
-            image_hash = get_image_hash(old_path)
+                if is_duplicate:
+                    print(f"🚫 DUPLICATE FOUND: Page {page_num} from {filename}")
+                    print(f"   Reason: {duplicate_reason}")
+                    print(f"   Already exists as: page_{duplicate_page_id}.png")
+                    if repeated_page_id:
+                        print(f"   ✅ Skipped without rendering")
+                    else:
+                        os.remove(old_path)
+                        print(f"   ✅ Skipped and removed duplicate image")
+                        note_fingerprint(duplicate_page_id, fingerprint)
+                    progress['duplicates_skipped'] += 1
+                    checkpoint.meta['duplicates_skipped'] = progress['duplicates_skipped']
+                else:
+                    # Note the image before moving it in, so a crash before the commit can undo it
+                    new_page_id = next_page_id(page_data)
+                    checkpoint.pending.append(new_page_id)
+                    checkpoint.save()
+                    os.rename(old_path, page_image_path(new_page_id))
+                    page_data[new_page_id] = build_page_record(text, filename, page_num, image_hash)
+                    note_fingerprint(new_page_id, fingerprint)
+                    page_index.add(new_page_id, page_data[new_page_id])
+                    added_ids.append(new_page_id)
             
-            try:
-                # Use hybrid OCR (Tesseract locally, EasyOCR for deployment)
-                text = extract_text_hybrid(old_path)
-            except:
-                text = f"Page from {filename} - {page_num}"
-            
-            # Strong duplicate detection
-            is_duplicate = False
-            duplicate_reason = ""
-            duplicate_page_id = ""
-            
-            for existing_id, existing_data in page_data.items():
-                existing_path = f'static/pages/page_{existing_id}.png'
-                if os.path.exists(existing_path):
-                    existing_hash = get_image_hash(existing_path)
-                    text_similarity = len(set(text.lower().split()) & set(existing_data['text'].lower().split())) / max(len(text.split()), len(existing_data['text'].split()), 1)
-                    
-                    if existing_hash == image_hash:
-                        is_duplicate = True
-                        duplicate_reason = "IDENTICAL IMAGE"
-                        duplicate_page_id = existing_id
-                        break
-                    elif text_similarity > 0.9:
-                        is_duplicate = True
-                        duplicate_reason = f"SAME TEXT ({int(text_similarity*100)}% match)"
-                        duplicate_page_id = existing_id
-                        break
-            
-            if is_duplicate:
-                os.remove(old_path)
-                print(f"🚫 DUPLICATE FOUND: Page {page_num} from {filename}")
-                print(f"   Reason: {duplicate_reason}")
-                print(f"   Already exists as: page_{duplicate_page_id}.png")
-                print(f"   ✅ Skipped and removed duplicate image")
-                progress['duplicates_skipped'] = progress.get('duplicates_skipped', 0) + 1
-            else:
-                os.rename(old_path, new_path)
-                page_data[new_page_id] = {
-                    'text': text,
-                    'original_text': text,
-                    'source_pdf': filename,
-                    'local_page': int(page_num),
-                    'image_hash': image_hash
-                }
-                new_pages += 1
+            batch.append(i + 1)
+            if len(batch) >= UPLOAD_COMMIT_EVERY:
+                commit()
             
-            progress['processed_pages'] = i + 1
-            progress['progress'] = int((i + 1) / len(image_files) * 100)
+            progress['processed_pages'] += 1
+            progress['progress'] = int(progress['processed_pages'] / len(doc) * 100)
+            progress.update(render_stats.as_dict())
+            progress.update(fingerprint_stats.as_dict())
             
-            # Add preview data for current page
+            # Add preview data for current page, from the fields just stored with it
             if not is_duplicate:
-                dob = extract_date_of_birth(text)
-                occ_place = extract_occupation_place(text)
-                native_addr = extract_native_address(text)
+                fields = page_data[new_page_id]['fields'] if new_page_id in page_data else {}
                 progress['current_preview'] = {
                     'page_id': new_page_id,
-                    'dob': dob,
-                    'occupation_place': occ_place,
-                    'native_address': native_addr
+                    'dob': fields.get('dob'),
+                    'occupation_place': fields.get('occupation_place'),
+                    'native_address': fields.get('native_address')
                 }
+            publish_progress(progress, stage='filed')
+        
+        doc.close()
+        print(f"🖼️  Rendered {render_stats.pages} pages in {render_stats.render_time:.1f}s, peak RSS {progress.get('peak_rss_mb')} MB")
+        if PAGE_FINGERPRINTS:
+            print(fingerprint_stats.summary())
         
         if not progress['cancelled']:
-            # Save data
-            with open('page_data.json', 'w', encoding='utf-8') as f:
-                json.dump(page_data, f, ensure_ascii=False, indent=2)
-            page_data = json.load(open('page_data.json', 'r', encoding='utf-8'))
+            commit()
+            with store_lock:
+                pages_added = len(stored_added_ids())
+            
+            # Remember the PDF so byte-identical re-uploads are rejected up front
+            if progress.get('pdf_sha256'):
+                with store_lock:
+                    ingested_pdfs[progress['pdf_sha256']] = {
+                        'filename': filename,
+                        'pages_added': pages_added,
+                        'ingested_at': datetime.now().isoformat(timespec='seconds')
+                    }
+                    save_pdf_registry(ingested_pdfs)
             
             progress['status'] = 'completed'
-            progress['pages_added'] = new_pages
-            progress['duplicates_skipped'] = progress.get('duplicates_skipped', 0)
+            progress['pages_added'] = pages_added
             progress['end_time'] = time.time()
-            print(f"\n✅ UPLOAD COMPLETED: {new_pages} new pages added, {progress['duplicates_skipped']} duplicates skipped")
+            print(f"\n✅ UPLOAD COMPLETED: {pages_added} new pages added, {progress['duplicates_skipped']} duplicates skipped")
+            if OCR_TWO_PASS:
+                print(f"🔍 Two-pass OCR: {progress['high_res_pages']} pages needed the full-zoom pass")
+        elif progress.get('keep_pages'):
+            commit()
+            with store_lock:
+                progress['pages_added'] = len(stored_added_ids())
+            progress['status'] = 'cancelled'
+            print(f"⏹️  UPLOAD CANCELLED: kept {progress['pages_added']} pages already processed")
         else:
+            # Cancel without keep_pages undoes the upload, including pages already committed
+            with store_lock:
+                remove_pages(stored_added_ids())
+                save_page_data(page_data)
             progress['status'] = 'cancelled'
+            progress['pages_added'] = 0
         
+        checkpoint.delete()
         os.remove(filepath)
         
     except Exception as e:
         progress['status'] = 'error'
         progress['error'] = str(e)
+        # Finished pages are kept; the checkpoint stays so a restart resumes after them
+        try:
+            commit()
+        except Exception:
+            pass
+    finally:
+        publish_progress(progress, stage=None)
+        lock = upload_locks.pop(upload_id, None)
+        if lock:
+            release_lock(lock, upload_lock_path(upload_id))
+
+def resume_interrupted_uploads():
+    """Restart uploads whose checkpoint outlived the process that was working on them"""
+    for name in os.listdir(app.config['UPLOAD_FOLDER']):
+        if not name.endswith('.checkpoint.json'):
+            continue
+        upload_id = name[:-len('.checkpoint.json')]
+        if upload_id in upload_progress:
+            continue
+        # Live uploads hold their lock, so this skips anything another worker is still running
+        lock = acquire_lock(upload_lock_path(upload_id))
+        if lock is None:
+            continue
+        checkpoint = IngestCheckpoint(upload_checkpoint_path(upload_id))
+        meta = checkpoint.meta
+        attempts = meta.get('attempts', 0) + 1
+        if not os.path.exists(checkpoint.path):
+            release_lock(lock, upload_lock_path(upload_id))
+            continue
+        if not os.path.exists(meta.get('filepath', '')) or attempts > MAX_RESUME_ATTEMPTS:
+            with store_lock:
+                checkpoint.recover(page_data)
+            checkpoint.delete()
+            if os.path.exists(meta.get('filepath', '')):
+                os.remove(meta['filepath'])
+            release_lock(lock, upload_lock_path(upload_id))
+            print(f"⚠️  Gave up on interrupted upload {meta.get('filename', upload_id)}")
+            continue
+        meta['attempts'] = attempts
+        checkpoint.save()
+        upload_locks[upload_id] = lock
+        start_pdf_processing(meta['filepath'], meta['filename'], meta.get('pdf_sha256'), upload_id=upload_id)
+        print(f"🔁 Resuming interrupted upload {meta['filename']} ({upload_id})")
+
+_uploads_resumed = SEARCH_ONLY  # A search-only server never picks up ingest work
+
+_store_owned = None  # Whether this process writes the store; decided on the first request
+
+def store_writable():
+    """Claim the store for this process (page_store.claim_store) the first time it's asked"""
+    global _store_owned
+    if _store_owned is None:
+        try:
+            claim_store()
+            _store_owned = True
+        except StoreInUse as e:
+            print(f"⚠️  {e}: serving read-only until the app is restarted")
+            _store_owned = False
+    return _store_owned
+
+@app.before_request
+def refuse_writes_when_search_only():
+    if request.method in ('GET', 'HEAD', 'OPTIONS'):
+        return None
+    if SEARCH_ONLY:
+        return jsonify({'error': 'This server is search-only'}), 403
+    if not store_writable():
+        return jsonify({'error': 'The page store is being written by another process (ingest.py?); '
+                                 'restart the app once it has finished'}), 503
+
+@app.before_request
+def resume_uploads_once():
+    # Deferred to the first request so the debug reloader's parent process never picks them up,
+    # nor claims the store
+    global _uploads_resumed
+    if not _uploads_resumed:
+        _uploads_resumed = True
+        if store_writable():
+            resume_interrupted_uploads()
+
+def progress_snapshot(upload_id):
+    """Copy of an upload's progress with elapsed time and ETA, as sent to the browser"""
+    progress = upload_progress[upload_id].copy()
+    if 'start_time' in progress:
+        elapsed = time.time() - progress['start_time']
+        progress['elapsed_time'] = round(elapsed, 1)
+        
+        # Pages committed before a restart don't count towards this run's speed
+        pages_this_run = progress['processed_pages'] - progress.get('resumed_pages', 0)
+        if pages_this_run > 0 and progress['total_pages'] > 0:
+            avg_time_per_page = elapsed / pages_this_run
+            remaining_pages = progress['total_pages'] - progress['processed_pages']
+            estimated_remaining = avg_time_per_page * remaining_pages
+            progress['estimated_remaining'] = round(estimated_remaining, 1)
+    
+    # Remove filepath from response
+    if 'filepath' in progress:
+        del progress['filepath']
+    return progress
 
 @app.route('/upload/progress/<upload_id>')
 def get_upload_progress(upload_id):
+    """Polling fallback for browsers or proxies that can't hold an event stream open"""
     if upload_id in upload_progress:
-        progress = upload_progress[upload_id].copy()
-        if 'start_time' in progress:
-            elapsed = time.time() - progress['start_time']
-            progress['elapsed_time'] = round(elapsed, 1)
-            
-            if progress['processed_pages'] > 0 and progress['total_pages'] > 0:
-                avg_time_per_page = elapsed / progress['processed_pages']
-                remaining_pages = progress['total_pages'] - progress['processed_pages']
-                estimated_remaining = avg_time_per_page * remaining_pages
-                progress['estimated_remaining'] = round(estimated_remaining, 1)
-        
-        # Remove filepath from response
-        if 'filepath' in progress:
-            del progress['filepath']
-        
-        return jsonify(progress)
+        return jsonify(progress_snapshot(upload_id))
     return jsonify({'error': 'Upload not found'}), 404
 
+@app.route('/upload/events/<upload_id>')
+def upload_events(upload_id):
+    """Server-Sent Events stream of an upload's progress, closed once the upload finishes
+
+    The stream only wakes to compare a sequence number, so under the gevent
+    worker an idle connection costs a greenlet rather than an OS thread.
+    """
+    if upload_id not in upload_progress:
+        return jsonify({'error': 'Upload not found'}), 404
+    
+    def stream():
+        seq = -1  # Nothing sent yet
+        last_sent = time.time()
+        while upload_id in upload_progress:
+            if upload_progress[upload_id].get('seq') != seq:
+                seq = upload_progress[upload_id].get('seq')
+                progress = progress_snapshot(upload_id)
+                yield f"event: progress\ndata: {json.dumps(progress)}\n\n"
+                last_sent = time.time()
+                if progress['status'] in ('completed', 'cancelled', 'error'):
+                    return
+            elif time.time() - last_sent >= UPLOAD_EVENTS_HEARTBEAT:
+                # Comment line, keeps proxies from closing a quiet connection
+                yield ": keep-alive\n\n"
+                last_sent = time.time()
+            time.sleep(UPLOAD_EVENTS_POLL_INTERVAL)
+    
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/upload/cancel/<upload_id>', methods=['POST'])
 def cancel_upload(upload_id):
+    """Stop an upload; with ?keep=1 or {"keep_pages": true} its processed pages are kept"""
     if upload_id in upload_progress:
+        options = request.get_json(silent=True) or {}
+        upload_progress[upload_id]['keep_pages'] = request.args.get('keep') == '1' or bool(options.get('keep_pages'))
         upload_progress[upload_id]['cancelled'] = True
         return jsonify({'success': True})
     return jsonify({'error': 'Upload not found'}), 404
@@ -428,21 +934,293 @@ def cancel_upload(upload_id):
 @app.route('/delete/<page_id>', methods=['DELETE'])
 def delete_page(page_id):
     global page_data
-    if page_id in page_data:
-        # Remove image file
-        image_path = f'static/pages/page_{page_id}.png'
-        if os.path.exists(image_path):
-            os.remove(image_path)
-        
-        # Remove from data
-        del page_data[page_id]
-        
-        # Save updated data
-        with open('page_data.json', 'w', encoding='utf-8') as f:
-            json.dump(page_data, f, ensure_ascii=False, indent=2)
-        
-        return jsonify({'success': True})
+    with store_lock:
+        if page_id in page_data:
+            # Remove image, index entry and record
+            remove_pages([page_id])
+            
+            # Save updated data
+            save_page_data(page_data)
+            
+            return jsonify({'success': True})
     return jsonify({'error': 'Page not found'}), 404
 
+BATCH_ACTIONS = ('delete', 'reocr', 'reextract')
+
+def set_page_text(page_id, text):
+    """Replace a page's OCR text and refresh everything derived from it"""
+    data = page_data[page_id]
+    data['text'] = text
+    data['original_text'] = text
+    refresh_page_fields(data)
+    _dedupe_cache.pop(page_id, None)
+    page_index.add(page_id, data)
+
+def reextract_page(page_id):
+    """Re-run place matching and field extraction over a page's stored text"""
+    data = page_data[page_id]
+    refresh_page_fields(data)
+    # The text is unchanged, so its postings stay as they are
+    page_index.replace_fields({page_id: data['fields']})
+
+def reocr_pages_background(job_id, page_ids):
+    """OCR existing page images again, then save page_data once"""
+    from ocr import extract_text_hybrid
+    progress = upload_progress[job_id]
+    try:
+        publish_progress(progress, status='processing')
+        for page_id in page_ids:
+            if progress['cancelled']:
+                break
+            if page_id in page_data:
+                publish_progress(progress, stage='ocr', current_page=page_id)
+                try:
+                    text = extract_text_hybrid(page_image_path(page_id))
+                    with store_lock:
+                        # The page may have been deleted while it was being OCR'd
+                        if page_id in page_data:
+                            set_page_text(page_id, text)
+                            progress['pages_updated'] += 1
+                except Exception as e:
+                    print(f"❌ Re-OCR failed for page {page_id}: {e}")
+                    progress['failed'].append(page_id)
+            progress['processed_pages'] += 1
+            progress['progress'] = int(progress['processed_pages'] / len(page_ids) * 100)
+            publish_progress(progress, stage='filed')
+
+        # Pages done before a cancel keep their new text
+        if progress['pages_updated']:
+            save_page_data(page_data)
+        progress['status'] = 'cancelled' if progress['cancelled'] else 'completed'
+        progress['end_time'] = time.time()
+        print(f"🔁 RE-OCR {progress['status'].upper()}: {progress['pages_updated']} pages updated")
+    except Exception as e:
+        progress['status'] = 'error'
+        progress['error'] = str(e)
+    finally:
+        publish_progress(progress, stage=None)
+
+@app.route('/pages/batch', methods=['POST'])
+def batch_pages():
+    """Delete, re-OCR or re-extract many pages, chosen by page_ids and/or source_pdf
+
+    Changes are applied to the store and the index together and page_data.json
+    is written once. Re-OCR runs in the background and is tracked like an
+    upload, through /upload/progress/<job_id> or /upload/events/<job_id>.
+    """
+    options = request.get_json(silent=True) or {}
+    action = options.get('action')
+    if action not in BATCH_ACTIONS:
+        return jsonify({'error': f"action must be one of: {', '.join(BATCH_ACTIONS)}"}), 400
+
+    requested = [str(page_id) for page_id in options.get('page_ids') or []]
+    source_pdf = options.get('source_pdf')
+    if not requested and not source_pdf:
+        return jsonify({'error': 'Give page_ids or source_pdf'}), 400
+
+    page_ids = [page_id for page_id in dict.fromkeys(requested) if page_id in page_data]
+    if source_pdf:
+        chosen = set(page_ids)
+        with store_lock:
+            page_ids += [page_id for page_id, data in page_data.items()
+                         if data.get('source_pdf') == source_pdf and page_id not in chosen]
+    missing = [page_id for page_id in requested if page_id not in page_data]
+    if not page_ids:
+        return jsonify({'error': 'No matching pages', 'missing': missing}), 404
+
+    if action == 'delete':
+        with store_lock:
+            removed = remove_pages(page_ids)
+            save_page_data(page_data)
+        print(f"🗑️  Deleted {len(removed)} pages")
+        return jsonify({'success': True, 'action': action, 'pages': len(removed), 'missing': missing})
+
+    if action == 'reextract':
+        with store_lock:
+            for page_id in page_ids:
+                if page_id in page_data:
+                    reextract_page(page_id)
+            save_page_data(page_data)
+        return jsonify({'success': True, 'action': action, 'pages': len(page_ids), 'missing': missing})
+
+    # OCR takes seconds per page, too long to hold the request open
+    job_id = str(uuid.uuid4())
+    upload_progress[job_id] = {
+        'status': 'starting',
+        'progress': 0,
+        'total_pages': len(page_ids),
+        'processed_pages': 0,
+        'pages_updated': 0,
+        'failed': [],
+        'start_time': time.time(),
+        'cancelled': False,
+        'filename': source_pdf or f'{len(page_ids)} pages'
+    }
+    start_native_thread(reocr_pages_background, job_id, page_ids)
+    return jsonify({'success': True, 'action': action, 'job_id': job_id, 'pages': len(page_ids), 'missing': missing}), 202
+
+# The running stale-page re-extraction, so two are never started at once
+reextract_job_id = None
+reextract_job_lock = Lock()
+
+def stale_page_ids():
+    """Pages whose stored fields were extracted under other rules, or never stored"""
+    with store_lock:
+        return [page_id for page_id, data in page_data.items() if data.get('rules_version') != RULES_VERSION]
+
+def reextract_stale_background(job_id, page_ids):
+    """Re-extract pages in a process pool, then swap all their new fields in at once
+
+    Searches use the old fields until every page is done. The index then
+    takes the new fields in one step and page_data.json is written once.
+    A page whose text changed while the job ran is left for the next run.
+    """
+    progress = upload_progress[job_id]
+    try:
+        publish_progress(progress, status='processing', stage='extracting')
+        with store_lock:
+            pages = [(page_id, page_data[page_id]['text']) for page_id in page_ids if page_id in page_data]
+        results = []
+        with ProcessPoolExecutor(max_workers=REEXTRACT_WORKERS, mp_context=process_pool_context()) as pool:
+            futures = [pool.submit(extract_records, pages[i:i + REEXTRACT_CHUNK])
+                       for i in range(0, len(pages), REEXTRACT_CHUNK)]
+            for future in as_completed(futures):
+                if progress['cancelled']:
+                    for pending in futures:
+                        pending.cancel()
+                    break
+                results.extend(future.result())
+                elapsed = time.time() - progress['start_time']
+                progress['processed_pages'] = len(results)
+                progress['progress'] = int(len(results) / len(pages) * 100)
+                progress['pages_per_sec'] = round(len(results) / elapsed, 1) if elapsed else None
+                publish_progress(progress)
+
+        if progress['cancelled']:
+            progress['status'] = 'cancelled'
+            progress['end_time'] = time.time()
+            return
+
+        publish_progress(progress, stage='swapping')
+        texts = dict(pages)
+        new_fields = {}
+        with store_lock:
+            for page_id, places, fields in results:
+                data = page_data.get(page_id)
+                if data is None or data['text'] != texts[page_id]:
+                    continue
+                data['places'], data['fields'], data['rules_version'] = places, fields, RULES_VERSION
+                new_fields[page_id] = fields
+            page_index.replace_fields(new_fields)
+            save_page_data(page_data)
+        page_index.columns()  # Build the new columns now rather than in the next search
+
+        progress['pages_updated'] = len(new_fields)
+        progress['status'] = 'completed'
+        progress['end_time'] = time.time()
+        elapsed = progress['end_time'] - progress['start_time']
+        print(f"🧮 RE-EXTRACTION COMPLETED: {len(new_fields)} pages to rules {RULES_VERSION} in {elapsed:.1f}s "
+              f"({len(results) / elapsed if elapsed else 0:.1f} pages/sec)")
+    except Exception as e:
+        progress['status'] = 'error'
+        progress['error'] = str(e)
+        print(f"❌ Re-extraction failed: {e}")
+    finally:
+        publish_progress(progress, stage=None)
+
+def start_stale_reextract():
+    """Start re-extracting stale pages; returns the job id (None if nothing is stale)"""
+    global reextract_job_id
+    with reextract_job_lock:
+        running = upload_progress.get(reextract_job_id)
+        if running and running['status'] in ('starting', 'processing'):
+            return reextract_job_id
+        page_ids = stale_page_ids()
+        if not page_ids:
+            return None
+        reextract_job_id = str(uuid.uuid4())
+        upload_progress[reextract_job_id] = {
+            'status': 'starting',
+            'progress': 0,
+            'total_pages': len(page_ids),
+            'processed_pages': 0,
+            'pages_updated': 0,
+            'pages_per_sec': None,
+            'rules_version': RULES_VERSION,
+            'start_time': time.time(),
+            'cancelled': False,
+            'filename': f'Re-extraction of {len(page_ids)} pages'
+        }
+    print(f"🧮 Re-extracting {len(page_ids)} pages with stale fields (rules {RULES_VERSION})")
+    start_native_thread(reextract_stale_background, reextract_job_id, page_ids)
+    return reextract_job_id
+
+_stale_checked = SEARCH_ONLY or not REEXTRACT_ON_START
+
+@app.before_request
+def reextract_stale_once():
+    # Like resuming uploads, deferred to the first request so importing app starts no work
+    global _stale_checked
+    if not _stale_checked:
+        _stale_checked = True
+        if store_writable():
+            start_stale_reextract()
+
+@app.route('/pages/reextract', methods=['GET'])
+def reextract_status():
+    """Current rules version, how many pages are stale and the running job, if any"""
+    running = upload_progress.get(reextract_job_id)
+    return jsonify({
+        'rules_version': RULES_VERSION,
+        'stale_pages': len(stale_page_ids()),
+        'job_id': reextract_job_id if running else None,
+        'job': progress_snapshot(reextract_job_id) if running else None
+    })
+
+@app.route('/pages/reextract', methods=['POST'])
+def reextract_stale():
+    """Re-extract every stale page in the background, tracked via /upload/progress/<job_id>"""
+    job_id = start_stale_reextract()
+    if job_id is None:
+        return jsonify({'success': True, 'pages': 0, 'rules_version': RULES_VERSION})
+    return jsonify({'success': True, 'job_id': job_id, 'pages': upload_progress[job_id]['total_pages'],
+                    'rules_version': RULES_VERSION}), 202
+
+def refuse_profile_admin():
+    """Error response unless profiling is on and the request carries PROFILE_TOKEN"""
+    if not PROFILING:
+        return jsonify({'error': 'Profiling is off'}), 404
+    if not PROFILE_TOKEN:
+        # Dumps hold file paths and call data; without a token there is no way to restrict them
+        return jsonify({'error': 'Set PROFILE_TOKEN to use the profile endpoints'}), 403
+    if not token_ok(profile_header()):
+        return jsonify({'error': 'Profile token required'}), 403
+    return None
+
+@app.route('/admin/profiles')
+def admin_profiles():
+    """Recent saved profiles, newest first"""
+    refused = refuse_profile_admin()
+    if refused:
+        return refused
+    return jsonify(list_profiles())
+
+@app.route('/admin/profiles/<name>')
+def admin_profile(name):
+    """Download a saved profile (pstats format), or ?format=text for a report sorted by ?sort="""
+    refused = refuse_profile_admin()
+    if refused:
+        return refused
+    path = profile_path(name)
+    if path is None:
+        return jsonify({'error': 'Profile not found'}), 404
+    if request.args.get('format') == 'text':
+        sort = request.args.get('sort', 'cumulative')
+        try:
+            return Response(profile_report(path, sort), mimetype='text/plain')
+        except KeyError:
+            return jsonify({'error': f'Unknown sort key {sort}'}), 400
+    return send_file(path, mimetype='application/octet-stream', as_attachment=True, download_name=name)
+
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
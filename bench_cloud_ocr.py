@@ -0,0 +1,72 @@
+import os
+import sys
+import tempfile
+import time
+
+from cloud_ocr import VisionOCRClient, QuotaExceeded
+from stub_server import start_stub_server, fake_text
+
+# (label, batch_size, concurrency, stub settings)
+SCENARIOS = [
+    ('one image per request', 1, 1, {}),
+    ('batched, concurrent', 8, 4, {}),
+    ('batched, 20% 503s', 8, 4, {'fail_rate': 0.2, 'seed': 1}),
+    ('batched, stub allows 4 req/s', 8, 4, {'rate_limit': 4}),
+]
+
+
+def make_images(directory, count):
+    """Small distinct files; the stub derives each page's text from the bytes"""
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f'page_{i:04d}.png')
+        with open(path, 'wb') as f:
+            f.write(f'fake page image {i}'.encode() * 64)
+        paths.append(path)
+    return paths
+
+
+def run(paths, batch_size, concurrency, settings):
+    server = start_stub_server(latency=0.05, per_image_latency=0.01, **settings)
+    try:
+        client = VisionOCRClient(api_key='stub', url=f'{server.url}/v1/images:annotate', batch_size=batch_size,
+                                 concurrency=concurrency, rate_limit=0, max_retries=8)
+        start = time.perf_counter()
+        texts = client.extract_texts(paths)
+        elapsed = time.perf_counter() - start
+        return texts, elapsed, client.stats, dict(server.state.stats)
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 96
+    with tempfile.TemporaryDirectory() as directory:
+        paths = make_images(directory, count)
+        expected = []
+        for path in paths:
+            with open(path, 'rb') as f:
+                expected.append(fake_text(f.read()))
+
+        print(f"{count} images against the local stub (50ms per request + 10ms per image)\n")
+        print(f"{'scenario':30s} {'time':>7s} {'img/s':>7s} {'reqs':>5s} {'retries':>7s} {'conns':>5s} {'failed':>6s}")
+        for label, batch_size, concurrency, settings in SCENARIOS:
+            texts, elapsed, stats, server_stats = run(paths, batch_size, concurrency, settings)
+            # Texts must come back in input order, whatever order the batches finished in
+            correct = sum(1 for text, want in zip(texts, expected) if text == want)
+            assert len(texts) == count and correct + stats['failed_images'] == count, label
+            print(f"{label:30s} {elapsed:6.2f}s {count / elapsed:7.1f} {stats['requests']:5d} "
+                  f"{stats['retries']:7d} {server_stats['connections']:5d} {stats['failed_images']:6d}")
+
+        # The quota stops the client before it sends, not after
+        server = start_stub_server(latency=0)
+        try:
+            client = VisionOCRClient(api_key='stub', url=f'{server.url}/v1/images:annotate', quota=10, rate_limit=0)
+            client.annotate(paths[:8])
+            try:
+                client.annotate(paths[8:16])
+                print("\n❌ quota not enforced")
+            except QuotaExceeded as e:
+                print(f"\n✅ {e} after {client.stats['images']} images, {server.state.stats['images']} sent")
+        finally:
+            server.shutdown()
@@ -0,0 +1,94 @@
+import os
+import sys
+import tempfile
+import time
+
+import requests
+
+from cloudinary_processor import PageDownloader, download_and_ocr_pages
+from stub_server import start_stub_server, fake_file
+
+PAGE_SIZE = 512 * 1024
+OCR_SECONDS = 0.05  # Stand-in OCR cost per page
+
+# (label, concurrency, stub settings)
+SCENARIOS = [
+    ('one at a time', 1, {}),
+    ('6 concurrent', 6, {}),
+    ('6 concurrent, 20% 503s', 6, {'fail_rate': 0.2, 'seed': 1}),
+    ('6 concurrent, 20% cut short', 6, {'truncate_rate': 0.2, 'seed': 2}),
+    ('6 concurrent, gzip-encoded', 6, {'gzip': True}),
+    ('6 concurrent, gzip, 20% cut short', 6, {'gzip': True, 'truncate_rate': 0.2, 'seed': 3}),
+]
+
+
+def page_urls(server, count):
+    return [f'{server.url}/files/page_{i:03d}.png?size={PAGE_SIZE}' for i in range(1, count + 1)]
+
+
+def check(directory, count):
+    """Every page on disk byte for byte, and no .part files left behind"""
+    for i in range(1, count + 1):
+        with open(os.path.join(directory, f'page_{i:03d}.png'), 'rb') as f:
+            assert f.read() == fake_file(f'page_{i:03d}.png', PAGE_SIZE), i
+    assert not [name for name in os.listdir(directory) if name.endswith('.part')]
+
+
+def naive(urls, directory):
+    """What download_image_from_url used to do for each page"""
+    for page_num, url in enumerate(urls, 1):
+        response = requests.get(url)
+        with open(os.path.join(directory, f'page_{page_num:03d}.png'), 'wb') as f:
+            f.write(response.content)
+
+
+def fake_ocr(path):
+    time.sleep(OCR_SECONDS)
+    return os.path.basename(path)
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    print(f"{count} pages of {PAGE_SIZE // 1024}KB from the local stub (50ms latency per request)\n")
+    print(f"{'scenario':34s} {'time':>7s} {'pages/s':>8s} {'retries':>7s} {'conns':>5s}")
+
+    server = start_stub_server(latency=0.05)
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        naive(page_urls(server, count), directory)
+        elapsed = time.perf_counter() - start
+        check(directory, count)
+        print(f"{'requests.get per page':34s} {elapsed:6.2f}s {count / elapsed:8.1f} {0:7d} "
+              f"{server.state.stats['connections']:5d}")
+    server.shutdown()
+
+    for label, concurrency, settings in SCENARIOS:
+        server = start_stub_server(latency=0.05, **settings)
+        downloader = PageDownloader(concurrency=concurrency, max_retries=8)
+        with tempfile.TemporaryDirectory() as directory:
+            start = time.perf_counter()
+            landed = list(downloader.download_pages(page_urls(server, count), directory))
+            elapsed = time.perf_counter() - start
+            assert all(path for _, path in landed), label
+            check(directory, count)
+        print(f"{label:34s} {elapsed:6.2f}s {count / elapsed:8.1f} {downloader.stats['retries']:7d} "
+              f"{server.state.stats['connections']:5d}")
+        server.shutdown()
+
+    # OCR overlapping the downloads versus downloading everything first
+    server = start_stub_server(latency=0.05)
+    with tempfile.TemporaryDirectory() as directory:
+        downloader = PageDownloader(concurrency=6)
+        start = time.perf_counter()
+        landed = sorted(downloader.download_pages(page_urls(server, count), directory))
+        texts = [fake_ocr(path) for _, path in landed]
+        sequential = time.perf_counter() - start
+
+        start = time.perf_counter()
+        pages = download_and_ocr_pages(page_urls(server, count), directory, ocr=fake_ocr,
+                                       downloader=PageDownloader(concurrency=6))
+        overlapped = time.perf_counter() - start
+        assert [text for _, _, text in pages] == texts
+    server.shutdown()
+    print(f"\nDownload then OCR ({OCR_SECONDS * 1000:.0f}ms/page): {sequential:.2f}s; "
+          f"OCR as pages land: {overlapped:.2f}s")
@@ -0,0 +1,157 @@
+import argparse
+import os
+import time
+
+import numpy as np
+
+from extraction import extract_record
+from preprocess import PREPROCESS_STEPS, preprocess, rotate, to_gray
+
+CONFIGS = [
+    ('none', ()),
+    ('binarize', ('binarize',)),
+    ('crop+deskew', ('crop', 'deskew')),
+    ('all', PREPROCESS_STEPS),
+]
+
+# Synthetic biodata sheets whose fields are known, so extraction accuracy can be scored
+PEOPLE = [
+    {'name': 'Ravi Kumar', 'dob': '12/04/1992', 'salary': '12', 'place': 'Hyderabad'},
+    {'name': 'Suresh Babu', 'dob': '03-11-1990', 'salary': '8.5', 'place': 'Guntur'},
+    {'name': 'Kiran Reddy', 'dob': '25/07/1994', 'salary': '18', 'place': 'Vijayawada'},
+    {'name': 'Anil Varma', 'dob': '09.02.1991', 'salary': '24', 'place': 'Bangalore'},
+]
+
+
+def synthetic_page(person, skew, zoom=3.0, seed=0):
+    """Render a biodata sheet, then scan it badly: dark border, shading, speckle and skew"""
+    import fitz
+    doc = fitz.open()
+    page = doc.new_page()
+    lines = [
+        f"Name: {person['name']}",
+        f"Date of Birth: {person['dob']}",
+        "Education: B.Tech (Computer Science)",
+        "Occupation: Software Engineer",
+        f"Salary: {person['salary']} lakhs per annum",
+        f"Native place: {person['place']}",
+        "Father: Retired Teacher  Mother: Home Maker",
+        "Height: 5 ft 9 in  Star: Rohini  Gothram: Kashyapa",
+    ]
+    for i, line in enumerate(lines):
+        page.insert_text((60, 90 + i * 30), line, fontsize=12)
+    gray = to_gray(page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csGRAY))
+    doc.close()
+
+    rng = np.random.default_rng(seed)
+    gray = rotate(gray, -skew)
+    h, w = gray.shape
+    # Uneven lighting towards the spine, a dark scanner border and salt-and-pepper noise
+    shade = np.linspace(0, 60, w, dtype=np.float32)[None, :]
+    gray = np.clip(gray.astype(np.float32) - shade, 0, 255).astype(np.uint8)
+    gray[:, :int(w * 0.03)] = 25
+    gray[:int(h * 0.02), :] = 35
+    gray[rng.random(gray.shape) < 0.004] = 0
+    gray[rng.random(gray.shape) < 0.004] = 255
+    return gray
+
+
+def field_hits(text, person=None):
+    """Fields found in OCR text: scored against the truth if known, else just counted"""
+    places, fields = extract_record(text)
+    if person is None:
+        return sum(1 for found in (fields['dob'], fields['salary'], places) if found), 3
+    hits = (fields['dob'] or '').replace('-', '/').replace('.', '/') == person['dob'].replace('-', '/').replace('.', '/')
+    hits += fields['salary'] == person['salary']
+    hits += person['place'] in places
+    return hits, 3
+
+
+def available_backends():
+    """OCR backends that can actually run here, with their text functions"""
+    from ocr import tesseract_text, easyocr_text, get_ocr_reader
+    probe = np.full((64, 64), 255, dtype=np.uint8)
+    backends = []
+    try:
+        tesseract_text(probe)
+        backends.append(('tesseract', tesseract_text))
+    except Exception as e:
+        print(f"⏭️  tesseract not available: {type(e).__name__}")
+    try:
+        if get_ocr_reader() is not None:
+            backends.append(('easyocr', easyocr_text))
+        else:
+            print("⏭️  easyocr turned off (OCR_EASYOCR=0)")
+    except ImportError as e:
+        print(f"⏭️  easyocr not available: {e}")
+    return backends
+
+
+def load_pages(args):
+    pages = []
+    for i in range(args.synthetic):
+        person = PEOPLE[i % len(PEOPLE)]
+        skew = (-3, -1.5, 0, 1, 2.5)[i % 5]
+        pages.append((f'synthetic-{i}', synthetic_page(person, skew, seed=i), person, skew))
+    for path in args.images:
+        paths = [os.path.join(path, name) for name in sorted(os.listdir(path))
+                 if name.endswith('.png')] if os.path.isdir(path) else [path]
+        from PIL import Image
+        for image_path in paths[:args.limit]:
+            with Image.open(image_path) as img:
+                pages.append((os.path.basename(image_path), to_gray(img.convert('L')), None, None))
+    return pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure OCR preprocessing: time per page and extraction accuracy")
+    parser.add_argument('images', nargs='*', help="page PNGs or directories of them (e.g. static/pages)")
+    parser.add_argument('--synthetic', type=int, default=10, help="synthetic noisy biodata pages to add")
+    parser.add_argument('--limit', type=int, default=20, help="pages to take from each directory")
+    args = parser.parse_args()
+
+    pages = load_pages(args)
+    print(f"{len(pages)} pages\n")
+
+    # Preprocessing on its own: time per step and what the geometry steps found
+    times = {step: [] for step in PREPROCESS_STEPS}
+    skew_errors = []
+    for name, gray, person, skew in pages:
+        _, info = preprocess(gray)
+        for step, seconds in info['times'].items():
+            times[step].append(seconds)
+        if skew is not None:
+            skew_errors.append(abs(info.get('skew_degrees', 0) - skew))
+    print("Preprocessing, mean per page:")
+    for step in PREPROCESS_STEPS:
+        print(f"  {step:10s} {np.mean(times[step]) * 1000:7.1f}ms")
+    print(f"  {'total':10s} {sum(np.mean(t) for t in times.values()) * 1000:7.1f}ms")
+    if skew_errors:
+        print(f"  deskew error on synthetic pages: mean {np.mean(skew_errors):.2f}°, max {max(skew_errors):.2f}°")
+
+    backends = available_backends()
+    if not backends:
+        print("\nNo OCR backend available; install Tesseract or EasyOCR to compare OCR time and accuracy")
+        return
+    print(f"\n{'backend':10s} {'steps':12s} {'prep/page':>10s} {'ocr/page':>10s} {'fields':>8s}")
+    for backend, ocr_text in backends:
+        for label, steps in CONFIGS:
+            prep_time = ocr_time = 0.0
+            hits = total = 0
+            for name, gray, person, skew in pages:
+                start = time.perf_counter()
+                image = preprocess(gray, steps)[0] if steps else gray
+                prep_time += time.perf_counter() - start
+                start = time.perf_counter()
+                text = ocr_text(image)
+                ocr_time += time.perf_counter() - start
+                page_hits, page_total = field_hits(text, person)
+                hits += page_hits
+                total += page_total
+            print(f"{backend:10s} {label:12s} {prep_time / len(pages) * 1000:8.0f}ms {ocr_time / len(pages):9.2f}s "
+                  f"{hits / total:8.0%}")
+    print("\nfields: DOB, salary and place recovered (scored against the truth on synthetic pages)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+import sys
+import time
+
+from app import page_data, extract_page_fields, match_page_places, place_gazetteer
+from page_index import PageIndex
+
+QUERIES = [
+    {'q': 'engineer'},
+    {'dob': '1992'},
+    {'salary': '12'},
+    {'place': 'hyderabad'},
+    {'place': 'nallaj'},
+    {'q': 'software', 'place': 'bangalore'},
+    {'q': 'b.tech', 'dob': '199'},
+    {'q': 'software engineer', 'salary': '1'},
+    {'place': 'guntur', 'dob': '199', 'salary': '1', 'q': 'a'},
+]
+
+
+def scan_filter(pages, fields_by_id, query='', dob='', place='', salary=''):
+    """The page-by-page loop search() used before the column table"""
+    canonical = place_gazetteer.canonical(place) if place else None
+    matches = []
+    for page_id, data in pages.items():
+        text = data['text'].lower()
+        fields = fields_by_id[page_id]
+        if query and query not in text:
+            continue
+        if dob and (not fields['dob'] or dob not in fields['dob']):
+            continue
+        if canonical:
+            if canonical not in fields['place']:
+                continue
+        elif place:
+            if place not in (fields['occupation_place'] or '').lower() and \
+                    place not in (fields['native_address'] or '').lower():
+                continue
+        if salary and (not fields['salary'] or salary not in fields['salary']):
+            continue
+        matches.append(page_id)
+    return matches
+
+
+def build_corpus(size):
+    """Cycle the real pages up to size, reusing their extracted fields"""
+    source = list(page_data.items())
+    source_fields = {}
+    for page_id, data in source:
+        match_page_places(data)
+        source_fields[page_id] = extract_page_fields(data)
+    pages, fields_by_id = {}, {}
+    for i in range(size):
+        source_id, data = source[i % len(source)]
+        pages[str(i + 1)] = data
+        fields_by_id[str(i + 1)] = source_fields[source_id]
+    return pages, fields_by_id
+
+
+def best_of(fn, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def run(size):
+    pages, fields_by_id = build_corpus(size)
+    start = time.perf_counter()
+    index = PageIndex(lambda data: fields_by_id[data['_id']])
+    for page_id, data in pages.items():
+        index.add(page_id, {'text': data['text'], '_id': page_id})
+    index.columns()
+    print(f"\n{size:,} pages (index built in {time.perf_counter() - start:.1f}s)")
+    print(f"{'filters':55s} {'matches':>8s} {'loop':>10s} {'columns':>10s} {'speed-up':>9s}")
+
+    for filters in QUERIES:
+        args = dict(query=filters.get('q', ''), dob=filters.get('dob', ''),
+                    place=filters.get('place', ''), salary=filters.get('salary', ''))
+        loop_time, expected = best_of(lambda: scan_filter(pages, fields_by_id, **args))
+        canonical = place_gazetteer.canonical(args['place']) if args['place'] else None
+        column_time, actual = best_of(lambda: index.page_ids_for(index.filter_mask(
+            args['query'], args['dob'], args['place'], args['salary'], place=canonical)))
+        assert actual == expected, f"results differ for {filters}"
+        print(f"{str(filters):55s} {len(expected):8d} {loop_time * 1000:8.1f}ms "
+              f"{column_time * 1000:8.1f}ms {loop_time / column_time:8.1f}x")
+
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10000, 100000]
+    for size in sizes:
+        run(size)
@@ -0,0 +1,88 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+# Each mode is measured in a fresh interpreter, so nothing is shared between them
+CHILD = r'''
+import json, os, sys, time
+
+def rss_mb():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 1024 / 1024
+    except ImportError:
+        return None
+
+start = time.perf_counter()
+import app
+result = {'import_time': time.perf_counter() - start}
+client = app.app.test_client()
+client.get('/search?q=engineer')
+result['rss_mb'] = rss_mb()
+if sys.argv[1] == 'ingest':
+    # What the first upload adds: the rendering stack and the OCR reader
+    start = time.perf_counter()
+    try:
+        import fitz, render, ocr
+        ocr.get_ocr_reader()
+        result['ingest_load_time'] = time.perf_counter() - start
+        result['ingest_rss_mb'] = rss_mb()
+    except ImportError as e:
+        result['ingest_error'] = str(e)
+result['heavy_modules'] = [name for name in ('fitz', 'PIL', 'easyocr', 'torch') if name in sys.modules]
+print(json.dumps(result))
+'''
+
+MODES = [
+    ('search-only', {'SEARCH_ONLY': '1'}, 'search'),
+    ('full, before ingest', {}, 'search'),
+    ('full, after ingest loads', {}, 'ingest'),
+]
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# The store files the app loads at startup, relative to its working directory
+DATA_FILES = ('page_data.json', 'ingested_pdfs.json')
+
+
+def measure(env, stage):
+    # Startup re-extraction would time the process pool and rewrite page_data.json,
+    # so it is off, and the child runs against a copy of the store in a scratch directory
+    env = dict(os.environ, REEXTRACT_ON_START='0', **env)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [HERE, env.get('PYTHONPATH')]))
+    with tempfile.TemporaryDirectory(prefix='bench_startup.') as workdir:
+        for name in DATA_FILES:
+            if os.path.exists(os.path.join(HERE, name)):
+                shutil.copy2(os.path.join(HERE, name), workdir)
+        output = subprocess.run([sys.executable, '-c', CHILD, stage], env=env, capture_output=True, text=True,
+                                cwd=workdir, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def fmt(value, unit):
+    return f"{value:.2f}{unit}" if isinstance(value, float) else '-'
+
+
+if __name__ == '__main__':
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    print(f"{'mode':26s} {'import':>8s} {'RSS':>9s}  loaded")
+    for name, env, stage in MODES:
+        runs = [measure(env, stage) for _ in range(repeat)]
+        best = min(runs, key=lambda r: r['import_time'])
+        if stage == 'ingest':
+            if 'ingest_error' in best:
+                print(f"{name:26s} {'':>8s} {'':>9s}  not available: {best['ingest_error']}")
+                continue
+            import_time, rss = best['import_time'] + best['ingest_load_time'], best['ingest_rss_mb']
+        else:
+            import_time, rss = best['import_time'], best['rss_mb']
+        print(f"{name:26s} {fmt(import_time, 's'):>8s} {fmt(rss, 'MB'):>9s}  {', '.join(best['heavy_modules']) or 'no OCR/rendering modules'}")
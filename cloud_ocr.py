@@ -1,8 +1,28 @@
 import requests
 import base64
 import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 from config import GOOGLE_VISION_API_KEY, CLOUDCONVERT_API_KEY
 
+# Google Vision batch client settings, overridable from the environment
+VISION_URL = os.getenv('VISION_URL', 'https://vision.googleapis.com/v1/images:annotate')
+VISION_BATCH_SIZE = int(os.getenv('VISION_BATCH_SIZE', '8'))  # Images per request; the API takes up to 16
+VISION_CONCURRENCY = int(os.getenv('VISION_CONCURRENCY', '4'))  # Requests in flight at once
+VISION_RATE_LIMIT = float(os.getenv('VISION_RATE_LIMIT', '5'))  # Requests per second, 0 = unlimited
+VISION_QUOTA = int(os.getenv('VISION_QUOTA', '0'))  # Images this process may send, 0 = unlimited
+VISION_MAX_RETRIES = int(os.getenv('VISION_MAX_RETRIES', '5'))
+VISION_TIMEOUT = (5, 60)  # (connect, read) seconds
+VISION_BACKOFF_BASE = 0.5
+VISION_BACKOFF_MAX = 30
+
+# Rate limiting and server-side failures are worth another try
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
 def convert_pdf_to_images(pdf_file_path):
     """Convert PDF to images using CloudConvert API"""
     url = "https://api.cloudconvert.com/v2/convert/pdf/png"
@@ -23,30 +43,156 @@ def convert_pdf_to_images(pdf_file_path):
     else:
         raise Exception(f"PDF conversion failed: {response.text}")
 
+class VisionError(Exception):
+    """A Vision request failed for good: rejected, or still failing after every retry"""
+
+class QuotaExceeded(VisionError):
+    """Sending more images would go over the configured quota"""
+
+class VisionOCRClient:
+    """Google Vision TEXT_DETECTION client that batches images and sends batches concurrently
+
+    Up to batch_size images go in one images:annotate request, at most
+    concurrency requests are in flight over one pooled session, requests
+    are spaced to rate_limit per second, and 429/5xx responses and network
+    errors are retried with exponential backoff (honouring Retry-After).
+    quota caps the images sent over the client's lifetime.
+    """
+
+    def __init__(self, api_key=GOOGLE_VISION_API_KEY, url=VISION_URL, batch_size=VISION_BATCH_SIZE,
+                 concurrency=VISION_CONCURRENCY, rate_limit=VISION_RATE_LIMIT, quota=VISION_QUOTA,
+                 max_retries=VISION_MAX_RETRIES, timeout=VISION_TIMEOUT):
+        self.api_key = api_key
+        self.url = url
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.rate_limit = rate_limit
+        self.quota = quota
+        self.max_retries = max_retries
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self._lock = threading.Lock()
+        self._next_request_at = 0.0
+        self.stats = {'requests': 0, 'images': 0, 'retries': 0, 'failed_images': 0}
+
+    def _reserve_quota(self, count):
+        with self._lock:
+            if self.quota and self.stats['images'] + count > self.quota:
+                raise QuotaExceeded(f"Vision quota of {self.quota} images reached")
+            self.stats['images'] += count
+
+    def _wait_for_rate_limit(self):
+        """Block until this thread may send, keeping requests 1/rate_limit seconds apart"""
+        if not self.rate_limit:
+            return
+        with self._lock:
+            now = time.monotonic()
+            send_at = max(now, self._next_request_at)
+            self._next_request_at = send_at + 1 / self.rate_limit
+        if send_at > now:
+            time.sleep(send_at - now)
+
+    def _backoff(self, attempt, response=None):
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after and retry_after.isdigit():
+            delay = float(retry_after)
+        else:
+            # Full jitter keeps concurrent workers from retrying in lockstep
+            delay = random.uniform(0, min(VISION_BACKOFF_MAX, VISION_BACKOFF_BASE * 2 ** attempt))
+        time.sleep(delay)
+
+    def annotate(self, image_paths):
+        """OCR one batch in a single request; text per image, None where Vision gave an error"""
+        payload = {'requests': []}
+        for path in image_paths:
+            with open(path, 'rb') as f:
+                content = base64.b64encode(f.read()).decode()
+            payload['requests'].append({
+                'image': {'content': content},
+                'features': [{'type': 'TEXT_DETECTION'}]
+            })
+        self._reserve_quota(len(image_paths))
+
+        for attempt in range(self.max_retries + 1):
+            self._wait_for_rate_limit()
+            with self._lock:
+                self.stats['requests'] += 1
+            try:
+                response = self.session.post(self.url, params={'key': self.api_key}, json=payload, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error, response = str(e), None
+            else:
+                if response.status_code == 200:
+                    break
+                if response.status_code not in RETRY_STATUSES:
+                    raise VisionError(f"Vision request failed ({response.status_code}): {response.text[:200]}")
+                error = f"HTTP {response.status_code}"
+            if attempt == self.max_retries:
+                raise VisionError(f"Vision request failed after {self.max_retries} retries: {error}")
+            with self._lock:
+                self.stats['retries'] += 1
+            self._backoff(attempt, response)
+
+        # A 200 that isn't one result per image (a proxy's error page, a truncated body) fails
+        # the batch like any other error, rather than pairing texts with the wrong pages
+        try:
+            responses = response.json()['responses']
+            if not isinstance(responses, list) or len(responses) != len(image_paths) or \
+                    not all(isinstance(result, dict) for result in responses):
+                raise ValueError(f"expected {len(image_paths)} results")
+            texts = []
+            for result in responses:
+                if 'error' in result:
+                    with self._lock:
+                        self.stats['failed_images'] += 1
+                    texts.append(None)
+                else:
+                    texts.append(result.get('fullTextAnnotation', {}).get('text', ''))
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            raise VisionError(f"Vision returned a malformed response: {e!r}"[:200])
+        return texts
+
+    def extract_texts(self, image_paths):
+        """OCR many images, batched and concurrent; texts come back in input order
+
+        A batch that fails for good yields None for each of its images, so
+        the caller can fall back to local OCR for just those pages.
+        """
+        batches = [image_paths[i:i + self.batch_size] for i in range(0, len(image_paths), self.batch_size)]
+
+        def run(batch):
+            try:
+                return self.annotate(batch)
+            except VisionError as e:
+                print(f"❌ {e}")
+                with self._lock:
+                    self.stats['failed_images'] += len(batch)
+                return [None] * len(batch)
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            results = pool.map(run, batches)
+            return [text for batch_texts in results for text in batch_texts]
+
+# One client per process, so every caller shares its session, rate limit and quota
+_vision_client = None
+_vision_client_lock = threading.Lock()
+
+def get_vision_client():
+    global _vision_client
+    with _vision_client_lock:
+        if _vision_client is None:
+            _vision_client = VisionOCRClient()
+        return _vision_client
+
 def extract_text_from_image(image_path):
     """Extract text using Google Vision API"""
-    url = f"https://vision.googleapis.com/v1/images:annotate?key={GOOGLE_VISION_API_KEY}"
-    
-    # Read and encode image
-    with open(image_path, 'rb') as f:
-        image_data = f.read()
-    
-    image_base64 = base64.b64encode(image_data).decode()
-    
-    payload = {
-        "requests": [{
-            "image": {"content": image_base64},
-            "features": [{"type": "TEXT_DETECTION"}]
-        }]
-    }
-    
-    response = requests.post(url, json=payload)
-    
-    if response.status_code == 200:
-        result = response.json()
-        if 'responses' in result and result['responses']:
-            text_annotation = result['responses'][0].get('fullTextAnnotation')
-            if text_annotation:
-                return text_annotation.get('text', '')
-    
-    return ""
\ No newline at end of file
+    try:
+        text = get_vision_client().annotate([image_path])[0]
+    except VisionError:
+        return ""
+    return text or ""
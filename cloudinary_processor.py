@@ -5,6 +5,22 @@ from cloudinary_config import CLOUDINARY_CONFIG
 import requests
 import tempfile
 import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+
+# Page image download settings, overridable from the environment
+DOWNLOAD_CONCURRENCY = int(os.getenv('DOWNLOAD_CONCURRENCY', '6'))  # Downloads in flight at once
+DOWNLOAD_MAX_RETRIES = int(os.getenv('DOWNLOAD_MAX_RETRIES', '4'))
+DOWNLOAD_TIMEOUT = (5, 30)  # (connect, read) seconds; read is per chunk, not per file
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+DOWNLOAD_BACKOFF_BASE = 0.5
+DOWNLOAD_BACKOFF_MAX = 20
+
+# Rate limiting and server-side failures are worth another try
+RETRY_STATUSES = {429, 500, 502, 503, 504}
 
 # Configure Cloudinary
 cloudinary.config(**CLOUDINARY_CONFIG)
@@ -48,14 +64,146 @@ def process_pdf_with_cloudinary(pdf_file_path, progress_callback=None):
         print(f"Cloudinary processing error: {e}")
         return []
 
+class DownloadError(Exception):
+    """A page image could not be downloaded, even after retrying"""
+
+class PageDownloader:
+    """Downloads page images over one pooled session, several at a time
+
+    Bodies are streamed to a .part file in chunks and only renamed into place
+    once their size matches Content-Length, so a truncated transfer never
+    leaves a half-written page behind. Network errors, short bodies and
+    429/5xx responses are retried with exponential backoff.
+    """
+
+    def __init__(self, concurrency=DOWNLOAD_CONCURRENCY, max_retries=DOWNLOAD_MAX_RETRIES, timeout=DOWNLOAD_TIMEOUT):
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self._lock = threading.Lock()
+        self.stats = {'downloads': 0, 'bytes': 0, 'retries': 0, 'failed': 0}
+
+    def _fetch(self, url, local_path):
+        """One attempt: stream url to local_path; returns bytes written or raises"""
+        part_path = local_path + '.part'
+        with self.session.get(url, stream=True, timeout=self.timeout) as response:
+            if response.status_code != 200:
+                response.content  # Read the short error body so the connection goes back to the pool
+                raise requests.HTTPError(f"HTTP {response.status_code}", response=response)
+            expected = response.headers.get('Content-Length')
+            written = 0
+            try:
+                with open(part_path, 'wb') as f:
+                    for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                        f.write(chunk)
+                        written += len(chunk)
+                # Content-Length counts the bytes sent, which for a gzip or deflate
+                # body is fewer than were written; the raw stream counts those
+                received = response.raw.tell()
+                if expected is not None and received != int(expected):
+                    raise DownloadError(f"size mismatch: got {received} of {expected} bytes")
+                if written == 0:
+                    raise DownloadError("empty body")
+                os.replace(part_path, local_path)
+            except BaseException:
+                if os.path.exists(part_path):
+                    os.remove(part_path)
+                raise
+        return written
+
+    def download(self, url, local_path):
+        """Download url to local_path with retries; returns the size, raises DownloadError when it gives up"""
+        for attempt in range(self.max_retries + 1):
+            response = None
+            try:
+                size = self._fetch(url, local_path)
+                with self._lock:
+                    self.stats['downloads'] += 1
+                    self.stats['bytes'] += size
+                return size
+            except requests.HTTPError as e:
+                error, response = str(e), e.response
+                if response.status_code not in RETRY_STATUSES:
+                    break
+            except (requests.ConnectionError, requests.Timeout,
+                    requests.exceptions.ChunkedEncodingError, DownloadError) as e:
+                error = str(e)
+            if attempt == self.max_retries:
+                break
+            with self._lock:
+                self.stats['retries'] += 1
+            retry_after = response.headers.get('Retry-After') if response is not None else None
+            if retry_after and retry_after.isdigit():
+                delay = float(retry_after)
+            else:
+                delay = random.uniform(0, min(DOWNLOAD_BACKOFF_MAX, DOWNLOAD_BACKOFF_BASE * 2 ** attempt))
+            time.sleep(delay)
+        with self._lock:
+            self.stats['failed'] += 1
+        raise DownloadError(f"Download of {url} failed: {error}")
+
+    def download_pages(self, urls, directory, name='page_{:03d}.png'):
+        """Download page images concurrently, yielding (page_num, path) as each one lands
+
+        Pages come out in completion order, not page order, so the caller can
+        start OCR on the first page while the rest are still downloading.
+        path is None for a page that could not be downloaded.
+        """
+        os.makedirs(directory, exist_ok=True)
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            futures = {}
+            for page_num, url in enumerate(urls, 1):
+                path = os.path.join(directory, name.format(page_num))
+                futures[pool.submit(self.download, url, path)] = (page_num, path)
+            for future in as_completed(futures):
+                page_num, path = futures[future]
+                try:
+                    future.result()
+                except DownloadError as e:
+                    print(f"Download error: {e}")
+                    path = None
+                yield page_num, path
+
+# One downloader per process, so every caller shares its connection pool
+_downloader = None
+_downloader_lock = threading.Lock()
+
+def get_downloader():
+    global _downloader
+    with _downloader_lock:
+        if _downloader is None:
+            _downloader = PageDownloader()
+        return _downloader
+
 def download_image_from_url(url, local_path):
     """Download image from Cloudinary URL to local storage"""
     try:
-        response = requests.get(url)
-        if response.status_code == 200:
-            with open(local_path, 'wb') as f:
-                f.write(response.content)
-            return True
-    except Exception as e:
+        get_downloader().download(url, local_path)
+        return True
+    except DownloadError as e:
         print(f"Download error: {e}")
-    return False
\ No newline at end of file
+    return False
+
+def download_and_ocr_pages(image_urls, directory, ocr=None, progress_callback=None, downloader=None):
+    """Download every page image and OCR each one as soon as it lands
+
+    Returns [(page_num, local_path, text)] in page order; pages that failed
+    to download are left out. OCR runs here while the remaining downloads
+    carry on in the background.
+    """
+    if ocr is None:
+        from ocr import extract_text_hybrid as ocr
+    downloader = downloader or get_downloader()
+    pages = []
+    for done, (page_num, path) in enumerate(downloader.download_pages(image_urls, directory), 1):
+        if path is not None:
+            pages.append((page_num, path, ocr(path)))
+        if progress_callback:
+            progress_callback(done, len(image_urls))
+    return sorted(pages)
@@ -0,0 +1,192 @@
+import hashlib
+import re
+
+from gazetteer import GAZETTEER_PATH, load_gazetteer
+
+# Field extraction shared by the web app, bulk ingest and the re-extraction
+# workers, which import this module without loading the app or the page store
+
+# Bump whenever an extractor's patterns or logic change. Stored fields tagged
+# with another version are stale and get re-extracted in the background.
+EXTRACTION_RULES_VERSION = 2
+
+def _gazetteer_digest(path=GAZETTEER_PATH):
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()[:8]
+    except FileNotFoundError:
+        return 'none'
+
+# Edits to places.json change the places (and so the fields) too, so they count as a rules change
+RULES_VERSION = f'{EXTRACTION_RULES_VERSION}-{_gazetteer_digest()}'
+
+# Place gazetteer (places.json) matched with Aho-Corasick at ingest
+place_gazetteer = load_gazetteer()
+
+def match_page_places(data):
+    """Match the gazetteer over a page once; the result feeds the place bitmaps"""
+    if 'places' not in data:
+        data['places'] = place_gazetteer.match(data['text'])
+    return data['places']
+
+def extract_date_of_birth(text):
+    """Extract date of birth from text with enhanced patterns"""
+    patterns = [
+        r'date\s*of\s*birth[:\s]*([0-9]{1,2}[-/.][0-9]{1,2}[-/.][0-9]{4})',
+        r'dob[:\s]*([0-9]{1,2}[-/.][0-9]{1,2}[-/.][0-9]{4})',
+        r'birth[:\s]*([0-9]{1,2}[-/.][0-9]{1,2}[-/.][0-9]{4})',
+        r'born[:\s]*([0-9]{1,2}[-/.][0-9]{1,2}[-/.][0-9]{4})',
+        r'([0-9]{1,2}[-/.][0-9]{1,2}[-/.]19[0-9]{2})',
+        r'([0-9]{1,2}[-/.][0-9]{1,2}[-/.]20[0-9]{2})',
+        r'([0-9]{1,2}\s*[-/.]\s*[0-9]{1,2}\s*[-/.]\s*[0-9]{4})',
+        r'([0-9]{1,2}[th|st|nd|rd]*\s*[a-zA-Z]+\s*[0-9]{4})'
+    ]
+    
+    text_lower = text.lower()
+    for pattern in patterns:
+        matches = re.findall(pattern, text_lower, re.IGNORECASE)
+        for match in matches:
+            # Normalize date format
+            date_str = re.sub(r'[^0-9/\-.]', '', match)
+            if len(date_str.split('/')) == 3 or len(date_str.split('-')) == 3 or len(date_str.split('.')) == 3:
+                return date_str
+    return None
+
+def extract_occupation_place(text):
+    """Extract place of work/occupation from text with enhanced patterns"""
+    patterns = [
+        r'working\s+(?:at|in|for)\s+([a-zA-Z0-9\s,.-]+?)(?:[,.]|\n|$)',
+        r'company[:\s]*([a-zA-Z0-9\s,.-]+?)(?:[,.]|\n|$)',
+        r'organization[:\s]*([a-zA-Z0-9\s,.-]+?)(?:[,.]|\n|$)',
+        r'employer[:\s]*([a-zA-Z0-9\s,.-]+?)(?:[,.]|\n|$)',
+        r'occupation[:\s]*([a-zA-Z0-9\s,.-]+?)(?:[,.]|\n|$)',
+        r'job[:\s]*([a-zA-Z0-9\s,.-]+?)(?:[,.]|\n|$)',
+        r'profession[:\s]*([a-zA-Z0-9\s,.-]+?)(?:[,.]|\n|$)',
+        r'place\s*of\s*work[:\s]*([a-zA-Z0-9\s,.-]+?)(?:[,.]|\n|$)',
+        r'current\s*location[:\s]*([a-zA-Z0-9\s,.-]+?)(?:[,.]|\n|$)',
+        # The original extractor's bare-city fallback, kept so occupation_place reads as it always has;
+        # place lookups and the place filter go through the gazetteer
+        r'(?:hyderabad|bangalore|chennai|mumbai|delhi|pune|kolkata|ahmedabad|surat|jaipur|lucknow|kanpur|nagpur|visakhapatnam|indore|thane|bhopal|patna|vadodara|ghaziabad|ludhiana|agra|nashik|faridabad|meerut|rajkot|kalyan|vasai|varanasi|srinagar|aurangabad|dhanbad|amritsar|navi mumbai|allahabad|ranchi|howrah|coimbatore|jabalpur|gwalior|vijayawada|jodhpur|madurai|raipur|kota|guwahati|chandigarh|solapur|hubli|tiruchirappalli|bareilly|mysore|tiruppur|gurgaon|aligarh|jalandhar|bhubaneswar|salem|warangal|guntur|bhiwandi|saharanpur|gorakhpur|bikaner|amravati|noida|jamshedpur|bhilai|cuttack|firozabad|kochi|nellore|bhavnagar|dehradun|durgapur|asansol|rourkela|nanded|kolhapur|ajmer|akola|gulbarga|jamnagar|ujjain|loni|siliguri|jhansi|ulhasnagar|jammu|sangli|miraj|kupwad|belgaum|mangalore|ambattur|tirunelveli|malegaon|gaya|jalgaon|udaipur|maheshtala)(?:\s|,|\.|$)'
+    ]
+    
+    text_lower = text.lower()
+    for pattern in patterns:
+        matches = re.findall(pattern, text_lower, re.IGNORECASE)
+        for match in matches:
+            if isinstance(match, str) and len(match.strip()) > 2:
+                return match.strip().title()
+    return None
+
+def extract_native_address(text):
+    """Extract native place/address from text with enhanced patterns"""
+    patterns = [
+        r'native[:\s]*([a-zA-Z0-9\s,.-]+?)(?:[,.]|\n|$)',
+        r'native\s*place[:\s]*([a-zA-Z0-9\s,.-]+?)(?:[,.]|\n|$)',
+        r'home\s*town[:\s]*([a-zA-Z0-9\s,.-]+?)(?:[,.]|\n|$)',
+        r'birth\s*place[:\s]*([a-zA-Z0-9\s,.-]+?)(?:[,.]|\n|$)',
+        r'place\s*of\s*birth[:\s]*([a-zA-Z0-9\s,.-]+?)(?:[,.]|\n|$)',
+        r'residential\s*address[:\s]*([a-zA-Z0-9\s,.-]+?)(?:\n|contact|phone|mobile)',
+        r'permanent\s*address[:\s]*([a-zA-Z0-9\s,.-]+?)(?:\n|contact|phone|mobile)',
+        r'address[:\s]*([a-zA-Z0-9\s,.-]+?)(?:\n|contact|phone|mobile)',
+        r'settled\s*(?:in|at)[:\s]*([a-zA-Z0-9\s,.-]+?)(?:[,.]|\n|$)'
+    ]
+    
+    text_lower = text.lower()
+    for pattern in patterns:
+        matches = re.findall(pattern, text_lower, re.IGNORECASE)
+        for match in matches:
+            if isinstance(match, str) and len(match.strip()) > 2:
+                return match.strip().title()
+    return None
+
+def extract_salary(text):
+    """Extract salary information from text with enhanced patterns"""
+    patterns = [
+        r'salary[:\s]*(\d+(?:\.\d+)?)\s*(?:lakhs?|lpa|k|crores?|thousands?)',
+        r'income[:\s]*(\d+(?:\.\d+)?)\s*(?:lakhs?|lpa|k|crores?|thousands?)',
+        r'package[:\s]*(\d+(?:\.\d+)?)\s*(?:lakhs?|lpa|k|crores?|thousands?)',
+        r'annual\s*(?:income|salary|package)[:\s]*(\d+(?:\.\d+)?)\s*(?:lakhs?|lpa|k|crores?|thousands?)',
+        r'ctc[:\s]*(\d+(?:\.\d+)?)\s*(?:lakhs?|lpa|k|crores?|thousands?)',
+        r'(\d+(?:\.\d+)?)\s*(?:lakhs?|lpa|k|crores?)\s*(?:per\s*annum|pa|annually)',
+        r'earning[:\s]*(\d+(?:\.\d+)?)\s*(?:lakhs?|lpa|k|crores?|thousands?)',
+        r'\$\s*(\d+(?:,\d{3})*(?:\.\d+)?)\s*(?:k|thousand|per\s*year|annually)?',
+        r'(\d+(?:\.\d+)?)\s*(?:thousand|k)\s*(?:usd|dollars?|per\s*month)'
+    ]
+    
+    text_lower = text.lower()
+    for pattern in patterns:
+        matches = re.findall(pattern, text_lower, re.IGNORECASE)
+        for match in matches:
+            if isinstance(match, str) and match.strip():
+                return match.strip()
+    return None
+
+# Salary bands (upper bound in lakhs per annum, label) used for facet counts
+SALARY_BANDS = [(5, '0-5 LPA'), (10, '5-10 LPA'), (20, '10-20 LPA'), (50, '20-50 LPA'), (float('inf'), '50+ LPA')]
+
+def extract_birth_year(dob):
+    """Return the year of an extracted date of birth, if plausible"""
+    if not dob:
+        return None
+    year = re.split(r'[-/.]', dob)[-1]
+    if len(year) == 4 and year.isdigit() and 1940 <= int(year) <= 2030:
+        return int(year)
+    return None
+
+def extract_salary_band(text, salary):
+    """Place an extracted salary into a band using the unit that follows it"""
+    if not salary:
+        return None
+    match = re.search(r'(\$\s*)?' + re.escape(salary) + r'\s*(lakhs?|lpa|crores?|thousands?|k)?\s*(usd|dollars?|per\s*month)?', text)
+    if not match:
+        return None
+    try:
+        value = float(salary.replace(',', ''))
+    except ValueError:
+        return None
+    unit = match.group(2) or ''
+    suffix = match.group(3) or ''
+    if match.group(1) or suffix.startswith(('usd', 'dollar')):
+        return 'USD'
+    if unit.startswith('crore'):
+        value *= 100
+    elif unit == 'k' or unit.startswith('thousand'):
+        value /= 100
+    if suffix.startswith('per'):
+        value *= 12
+    for upper, label in SALARY_BANDS:
+        if value < upper:
+            return label
+    return None
+
+def extract_page_fields(data):
+    """Run every extractor once for a page; the result is stored with the page and cached in page_index"""
+    text = data['text'].lower()
+    dob = extract_date_of_birth(text)
+    salary = extract_salary(text)
+    return {
+        'dob': dob,
+        'occupation_place': extract_occupation_place(text),
+        'native_address': extract_native_address(text),
+        'salary': salary,
+        'place': data.get('places', []),
+        'birth_year': extract_birth_year(dob),
+        'salary_band': extract_salary_band(text, salary)
+    }
+
+# A labelled name ("Name: Ravi", "name - ravi"), one of the fields checked to judge an OCR pass
+NAME_PATTERN = re.compile(r'\bname\s*[:\-.]?\s*[a-z]{2,}')
+
+def key_field_hits(text):
+    """How many of the fields a reader looks for first (DOB, name) the text yields"""
+    text = text.lower()
+    return (extract_date_of_birth(text) is not None) + (NAME_PATTERN.search(text) is not None)
+
+def extract_record(text):
+    """Places and fields for a page text under the current rules"""
+    places = place_gazetteer.match(text)
+    return places, extract_page_fields({'text': text, 'places': places})
+
+def extract_records(pages):
+    """Process pool worker: [(page_id, text)] -> [(page_id, places, fields)]"""
+    return [(page_id,) + extract_record(text) for page_id, text in pages]
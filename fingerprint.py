@@ -0,0 +1,243 @@
+import hashlib
+import os
+import re
+from collections import namedtuple
+
+# Page fingerprints from the PDF itself, before anything is rendered: re-exports of
+# the same compilation carry the same embedded page images and drawing operators,
+# only renumbered, recompressed and reformatted. A fingerprint hashes the page size,
+# its content streams with those differences normalised away, and everything they
+# draw: images, and forms down to the images and forms nested inside them.
+PAGE_FINGERPRINTS = os.getenv('PAGE_FINGERPRINTS', '1') == '1'
+
+# Content stream tokens: strings (kept as they are), names, numbers and whitespace
+_TOKEN = re.compile(rb'(\((?:\\.|[^\\)])*\)|<[0-9A-Fa-f\s]*>)|/([^\s/\[\]()<>{}%]+)|([-+]?(?:\d+\.\d*|\.\d+|\d+))|(\s+)')
+_SUBSET_PREFIX = re.compile(r'^[A-Z]{6}\+')
+_EMPTY_SAVE = re.compile(rb'(?<!\S)q Q(?!\S)')  # A q/Q pair with nothing drawn between
+
+
+# Image codecs are hashed as stored: re-exports copy them untouched, and decoding a
+# JPEG costs as much as a low-zoom render. Flate and friends are undone first.
+IMAGE_CODECS = ('DCTDecode', 'JPXDecode', 'JBIG2Decode', 'CCITTFaxDecode')
+
+# Dictionary keys left out of a digest: stream framing, export metadata, and the
+# links back to pages and out to actions, none of which change what is drawn
+IGNORED_KEYS = {'Length', 'Filter', 'Metadata', 'PieceInfo', 'LastModified', 'StructParent', 'StructParents',
+                'Parent', 'P', 'Popup', 'NM', 'M', 'CreationDate', 'Dest', 'A', 'PA'}
+
+# The object syntax PyMuPDF prints: dict and array brackets, strings, names, references and the rest
+_OBJECT_TOKEN = re.compile(r'<<|>>|\[|\]|\((?:\\.|[^\\)])*\)|<[0-9A-Fa-f\s]*>|/[^\s/\[\]()<>{}%]*|'
+                           r'\d+\s+\d+\s+R(?![^\s/\[\]()<>])|[^\s/\[\]()<>{}%]+')
+_NUMBER = re.compile(r'[-+]?(?:\d+\.\d*|\.\d+|\d+)')
+
+Ref = namedtuple('Ref', 'xref')
+
+
+def _parse_value(tokens, i):
+    token = tokens[i]
+    if token == '<<':
+        value = {}
+        i += 1
+        while tokens[i] != '>>':
+            value[tokens[i][1:]], i = _parse_value(tokens, i + 1)
+        return value, i + 1
+    if token == '[':
+        value = []
+        i += 1
+        while tokens[i] != ']':
+            item, i = _parse_value(tokens, i)
+            value.append(item)
+        return value, i + 1
+    if token.endswith('R') and token[0].isdigit():
+        return Ref(int(token.split()[0])), i + 1
+    return token, i + 1
+
+
+def parse_object(text):
+    """An object as PyMuPDF prints it, as dicts, lists, Refs and str tokens"""
+    return _parse_value(_OBJECT_TOKEN.findall(text), 0)[0]
+
+
+def _load(doc, value):
+    """The object a Ref points to; other values are returned as they are"""
+    if isinstance(value, Ref):
+        return parse_object(doc.xref_object(value.xref, compressed=True))
+    return value
+
+
+def _canonical(doc, value, cache):
+    """Bytes of a parsed value with keys sorted, numbers formatted alike and references digested"""
+    if isinstance(value, dict):
+        items = sorted((key, item) for key, item in value.items() if key not in IGNORED_KEYS)
+        return b'<<' + b' '.join(b'/%s %s' % (key.encode(), _canonical(doc, item, cache)) for key, item in items) + b'>>'
+    if isinstance(value, list):
+        return b'[' + b' '.join(_canonical(doc, item, cache) for item in value) + b']'
+    if isinstance(value, Ref):
+        return b'@' + _object_digest(doc, value.xref, cache).encode()
+    if _NUMBER.fullmatch(value):
+        return b'%g' % (round(float(value), 3) + 0.0)
+    return value.encode('utf-8', 'replace')
+
+
+def _value_digest(doc, value, cache):
+    if isinstance(value, Ref):
+        return _object_digest(doc, value.xref, cache)
+    return hashlib.sha256(_canonical(doc, value, cache)).hexdigest()
+
+
+def _object_digest(doc, xref, cache):
+    """Digest of an object and everything it references, cached per document
+
+    A font stands in as its base font name, since re-exports re-subset and
+    re-embed fonts and the text itself is in the content stream. A form or
+    tiling pattern is hashed by its content stream with its own resource
+    names replaced by their digests, so whatever it draws, nested forms and
+    images included, is part of the digest.
+    """
+    digest = cache.get(xref)
+    if digest is None:
+        cache[xref] = 'cycle'  # An object reached again through its own references
+        obj = parse_object(doc.xref_object(xref, compressed=True))
+        if isinstance(obj, dict) and 'BaseFont' in obj:
+            digest = 'font:' + _SUBSET_PREFIX.sub('', obj['BaseFont'].lstrip('/'))
+        elif not doc.xref_is_stream(xref):
+            digest = hashlib.sha256(_canonical(doc, obj, cache)).hexdigest()
+        else:
+            if obj.get('Subtype') == '/Form' or 'Resources' in obj:
+                stream = normalise_contents(doc.xref_stream(xref) or b'', _resource_names(doc, obj.get('Resources'), cache))
+            elif any(codec in str(obj.get('Filter')) for codec in IMAGE_CODECS):
+                stream = doc.xref_stream_raw(xref) or b''
+            else:
+                # Decoded, so the parameters of the compression no longer matter
+                obj = {key: item for key, item in obj.items() if key != 'DecodeParms'}
+                stream = doc.xref_stream(xref) or b''
+            hasher = hashlib.sha256(_canonical(doc, {key: item for key, item in obj.items() if key != 'Resources'}, cache))
+            hasher.update(b'|')
+            hasher.update(stream)
+            digest = hasher.hexdigest()
+        cache[xref] = digest
+    return digest
+
+
+def _resource_names(doc, resources, cache):
+    """Resource name -> digest of what it names, for one resource dictionary"""
+    names = {}
+    resources = _load(doc, resources)
+    if not isinstance(resources, dict):
+        return names
+    for category in sorted(resources):
+        entries = _load(doc, resources[category])
+        if not isinstance(entries, dict):
+            continue  # ProcSet
+        for name, value in entries.items():
+            stand_in = _value_digest(doc, value, cache).encode()
+            key = name.encode()
+            # The same name in two categories (a font and an image) keeps both
+            names[key] = names[key] + b'|' + stand_in if key in names else stand_in
+    return names
+
+
+def _page_object(doc, xref):
+    """A page's dictionary, with Resources inherited from the page tree if it has none"""
+    page = parse_object(doc.xref_object(xref, compressed=True))
+    node = page
+    for _ in range(32):  # Page trees are shallow; this only stops a Parent loop
+        if 'Resources' in node or not isinstance(node.get('Parent'), Ref):
+            break
+        node = _load(doc, node['Parent'])
+    page['Resources'] = node.get('Resources')
+    return page
+
+
+def normalise_contents(contents, names=None):
+    """Content stream bytes with resource names, number formatting and whitespace made canonical"""
+    names = names or {}
+
+    def token(match):
+        string, name, number, _ = match.groups()
+        if string is not None:
+            return string
+        if name is not None:
+            return b'/' + names.get(name, name)
+        if number is not None:
+            value = round(float(number), 3) + 0.0  # + 0.0 turns -0.0 into 0.0
+            return b'%g' % value
+        return b' '
+
+    contents = _TOKEN.sub(token, contents)
+    while True:
+        contents, removed = _EMPTY_SAVE.subn(b'', contents)
+        if not removed:
+            return b' '.join(contents.split())
+        contents = b' '.join(contents.split())
+
+
+def page_fingerprint(page, cache=None):
+    """Hex fingerprint of a PyMuPDF page, or None if it can't be read; pass one cache dict per document
+
+    Objects shared by many pages (a logo, a border, a font) are hashed once
+    per document through the cache.
+    """
+    cache = {} if cache is None else cache
+    doc = page.parent
+    try:
+        data = _page_object(doc, page.xref)
+        hasher = hashlib.sha256()
+        hasher.update(b'%g %g %d|' % (round(page.rect.width, 1), round(page.rect.height, 1), page.rotation))
+        hasher.update(normalise_contents(page.read_contents(), _resource_names(doc, data['Resources'], cache)))
+        # Annotations are drawn too, from their appearance streams
+        hasher.update(b'|' + _canonical(doc, _load(doc, data.get('Annots', [])), cache))
+    except Exception:
+        # A page that can't be fully accounted for is rendered, never skipped
+        return None
+    return hasher.hexdigest()
+
+
+class FingerprintStats:
+    """Pages skipped by fingerprint in one run, and the render and OCR time that saved
+
+    The time avoided is estimated from the mean render and OCR time of the
+    pages the run did process or, when it skipped every page, of all pages
+    processed since the process started (page_costs).
+    """
+
+    def __init__(self, baseline=None):
+        self.baseline = baseline
+        self.fingerprint_time = 0.0
+        self.skipped = 0
+        self.processed = 0
+        self.render_time = 0.0
+        self.ocr_time = 0.0
+
+    def add_processed(self, render_time, ocr_time):
+        self.processed += 1
+        self.render_time += render_time
+        self.ocr_time += ocr_time
+        if self.baseline is not None:
+            self.baseline.add_processed(render_time, ocr_time)
+
+    def avoided(self, kind):
+        costs = self if self.processed or self.baseline is None else self.baseline
+        if not costs.processed:
+            return None
+        return round(self.skipped * getattr(costs, kind) / costs.processed, 1)
+
+    def as_dict(self):
+        return {
+            'fingerprint_skipped': self.skipped,
+            'fingerprint_time': round(self.fingerprint_time, 2),
+            'render_time_avoided': self.avoided('render_time'),
+            'ocr_time_avoided': self.avoided('ocr_time')
+        }
+
+    def summary(self):
+        if self.avoided('render_time') is None:
+            saved = "no pages processed to estimate the time saved"
+        else:
+            saved = f"~{self.avoided('render_time')}s render and ~{self.avoided('ocr_time')}s OCR avoided"
+        return (f"🔁 Fingerprints: {self.skipped} repeated pages skipped before rendering "
+                f"({self.fingerprint_time:.2f}s fingerprinting), {saved}")
+
+
+# Render and OCR time of every page processed by this process
+page_costs = FingerprintStats()
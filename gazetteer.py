@@ -0,0 +1,123 @@
+import json
+import os
+from collections import deque
+
+GAZETTEER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'places.json')
+
+
+def normalize_place_text(text):
+    """Lowercase and collapse whitespace so aliases match across OCR line breaks"""
+    return ' '.join(text.lower().split())
+
+
+class PlaceGazetteer:
+    """Aho-Corasick automaton over place names and their alias/misspelling variants.
+
+    Matching cost depends on the length of the text, not on the number of
+    places, so the gazetteer can grow to tens of thousands of villages and
+    districts without slowing ingest down.
+    """
+
+    def __init__(self, places=None):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [None]
+        self._aliases = {}
+        self._built = False
+        for canonical, variants in (places or {}).items():
+            self.add(canonical, variants)
+
+    def add(self, canonical, variants=()):
+        """Register a canonical place name together with its variants"""
+        for term in [canonical] + list(variants):
+            term = normalize_place_text(term)
+            if not term:
+                continue
+            self._aliases[term] = canonical
+            state = 0
+            for ch in term:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(None)
+                state = nxt
+            self._out[state] = (len(term), canonical)
+        self._built = False
+
+    def _build(self):
+        """Compute failure and dictionary-suffix links breadth-first"""
+        goto, fail, out = self._goto, self._fail, self._out
+        dict_link = [0] * len(goto)
+        queue = deque(goto[0].values())
+        for state in queue:
+            fail[state] = 0
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                dict_link[nxt] = fail[nxt] if out[fail[nxt]] else dict_link[fail[nxt]]
+        self._dict_link = dict_link
+        self._built = True
+
+    def __len__(self):
+        return len(self._aliases)
+
+    def canonical(self, name):
+        """Return the canonical place for a name or alias, or None if unknown"""
+        return self._aliases.get(normalize_place_text(name))
+
+    def find(self, text):
+        """Return (start, end, canonical) for every whole-word match, leftmost-longest"""
+        if not self._built:
+            self._build()
+        text = normalize_place_text(text)
+        goto, fail, out, dict_link = self._goto, self._fail, self._out, self._dict_link
+        candidates = []
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            hit = state if out[state] else dict_link[state]
+            while hit:
+                length, canonical = out[hit]
+                start, end = i - length + 1, i + 1
+                if (start == 0 or not text[start - 1].isalnum()) and \
+                        (end == len(text) or not text[end].isalnum()):
+                    candidates.append((start, end, canonical))
+                hit = dict_link[hit]
+
+        # Keep the longest match at each position and drop overlaps ("navi mumbai" over "mumbai")
+        candidates.sort(key=lambda m: (m[0], -m[1]))
+        matches = []
+        last_end = -1
+        for start, end, canonical in candidates:
+            if start >= last_end:
+                matches.append((start, end, canonical))
+                last_end = end
+        return matches
+
+    def match(self, text):
+        """Return the distinct canonical places mentioned in text, in order of first appearance"""
+        seen = []
+        for _, _, canonical in self.find(text):
+            if canonical not in seen:
+                seen.append(canonical)
+        return seen
+
+
+def load_gazetteer(path=GAZETTEER_PATH):
+    """Load the place gazetteer from a JSON file of {canonical: [aliases]}"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            places = json.load(f)
+    except FileNotFoundError:
+        places = {}
+    return PlaceGazetteer(places)
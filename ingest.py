@@ -0,0 +1,298 @@
+import argparse
+import hashlib
+import os
+import sys
+import time
+from collections import deque
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+import fitz  # PyMuPDF
+
+from page_store import StoreInUse, claim_store
+from render import RENDER_ZOOM
+
+STAGING_DIR = 'uploads/.ingest'
+CHECKPOINT_PATH = 'ingest_checkpoint.json'
+
+# Worker-local cache of the PDF being rendered, so pages don't reopen it
+_open_doc = None
+
+
+def render_and_ocr(task):
+    """Worker: render one PDF page to a staged PNG, hash it and OCR it
+
+    With the vision backend the worker only renders; the text is left as
+    None and the main process sends the staged images to Vision in batches.
+    With OCR_TWO_PASS a local page is read at RENDER_LOW_ZOOM first and
+    rendered again at zoom only if that read poorly.
+    """
+    global _open_doc
+    from ocr import OCR_TWO_PASS
+    from render import RenderStats, render_page_to_file
+
+    pdf_path, page_num, zoom, ocr_backend = task
+    if _open_doc is None or _open_doc.name != pdf_path:
+        if _open_doc is not None:
+            _open_doc.close()
+        _open_doc = fitz.open(pdf_path)
+
+    stem = os.path.splitext(os.path.basename(pdf_path))[0]
+    staged_path = os.path.join(STAGING_DIR, f'{stem}-{page_num:03d}.png')
+    high_res = False
+    render_stats = RenderStats()
+    start = time.perf_counter()
+    if OCR_TWO_PASS and ocr_backend != 'vision':
+        text, high_res = two_pass_ocr(_open_doc[page_num - 1], staged_path, pdf_path, page_num, zoom, render_stats)
+    else:
+        pixels = render_page_to_file(_open_doc[page_num - 1], staged_path, render_stats, zoom=zoom,
+                                     keep_pixels=ocr_backend != 'vision')
+        text = None if ocr_backend == 'vision' else local_ocr(staged_path, pdf_path, page_num, pixels)
+    ocr_time = time.perf_counter() - start - render_stats.render_time
+
+    with open(staged_path, 'rb') as f:
+        image_hash = hashlib.md5(f.read()).hexdigest()
+    return {'page_num': page_num, 'staged_path': staged_path, 'image_hash': image_hash, 'text': text,
+            'high_res': high_res, 'render_time': render_stats.render_time, 'ocr_time': ocr_time}
+
+
+def local_ocr(staged_path, pdf_path, page_num, pixels=None):
+    from ocr import extract_text_hybrid
+    try:
+        return extract_text_hybrid(staged_path, pixels)
+    except:
+        return f"Page from {os.path.basename(pdf_path)} - {page_num:03d}"
+
+
+def two_pass_ocr(page, staged_path, pdf_path, page_num, zoom, stats=None):
+    from ocr import extract_text_two_pass
+    try:
+        return extract_text_two_pass(page, staged_path, stats, high_zoom=zoom)
+    except:
+        return f"Page from {os.path.basename(pdf_path)} - {page_num:03d}", False
+
+
+def vision_ocr(results, client, pdf_path):
+    """Fill in the text of rendered pages with batched Vision requests, locally where Vision fails"""
+    start = time.perf_counter()
+    texts = client.extract_texts([result['staged_path'] for result in results])
+    fallbacks = 0
+    for result, text in zip(results, texts):
+        if text is None:
+            text = local_ocr(result['staged_path'], pdf_path, result['page_num'])
+            fallbacks += 1
+        result['text'] = text
+    # Pages are OCR'd together; each is charged an equal share of the wall time
+    for result in results:
+        result['ocr_time'] += (time.perf_counter() - start) / len(results)
+    return fallbacks
+
+
+def list_pdfs(directory):
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.lower().endswith('.pdf')
+    )
+
+
+def ingest_directory(directory, workers=None, batch_size=25, zoom=RENDER_ZOOM, checkpoint_path=CHECKPOINT_PATH,
+                     ocr_backend='local'):
+    """Ingest every PDF in directory into the page store, resuming from the checkpoint
+
+    Raises StoreInUse if the web app (or another ingest) is writing the store.
+    """
+    # Claimed before app loads the store, so nothing can change it under this process
+    claim_store()
+
+    # The store, dedupe and extraction rules are the web app's own
+    from app import page_data, find_duplicate, build_page_record, find_fingerprint, note_fingerprint
+    from fingerprint import PAGE_FINGERPRINTS, FingerprintStats, page_costs, page_fingerprint
+    from ocr import OCR_TWO_PASS
+    from page_store import (IngestCheckpoint, save_page_data, next_page_id, page_image_path,
+                            load_pdf_registry, save_pdf_registry, file_sha256, store_lock)
+
+    os.makedirs(STAGING_DIR, exist_ok=True)
+    checkpoint = IngestCheckpoint(checkpoint_path)
+    with store_lock:
+        removed = checkpoint.recover(page_data)
+    if removed:
+        print(f"🧹 Removed {len(removed)} pages of an interrupted commit")
+    checkpoint.save()
+
+    ingested_pdfs = load_pdf_registry()
+    stats = {'pages': 0, 'added': 0, 'duplicates': 0, 'high_res_pages': 0}
+    fingerprint_stats = FingerprintStats(page_costs)
+    vision_client = None
+    if ocr_backend == 'vision':
+        from cloud_ocr import get_vision_client
+        vision_client = get_vision_client()
+        stats['vision_fallbacks'] = 0
+        # Enough rendered pages to keep every concurrent Vision request full
+        ocr_chunk = vision_client.batch_size * vision_client.concurrency
+    batch = []  # (checkpoint entry, page number) processed since the last commit
+
+    def commit():
+        """Persist the store, then record the batch's pages as done in the checkpoint"""
+        if not batch:
+            return
+        save_page_data(page_data)
+        for entry, page_num in batch:
+            entry['done'].append(page_num)
+        checkpoint.pending = []
+        checkpoint.save()
+        batch.clear()
+
+    def file_result(result, entry, filename):
+        """Add one rendered and OCR'd page to the store, or drop it as a duplicate"""
+        stats['pages'] += 1
+        stats['high_res_pages'] += result['high_res']
+        fingerprint_stats.add_processed(result['render_time'], result['ocr_time'])
+        # Orders this process's own threads; other processes are kept out by claim_store
+        with store_lock:
+            duplicate_page_id, reason = find_duplicate(result['text'], result['image_hash'])
+            if duplicate_page_id:
+                os.remove(result['staged_path'])
+                print(f"   🚫 page {result['page_num']}: {reason}, already page_{duplicate_page_id}.png")
+                stats['duplicates'] += 1
+                note_fingerprint(duplicate_page_id, result['fingerprint'])
+            else:
+                # Note the image before moving it in, so a crash before the commit can undo it
+                page_id = next_page_id(page_data)
+                checkpoint.pending.append(page_id)
+                checkpoint.save()
+                os.replace(result['staged_path'], page_image_path(page_id))
+                page_data[page_id] = build_page_record(
+                    result['text'], filename, result['page_num'], result['image_hash'])
+                note_fingerprint(page_id, result['fingerprint'])
+                stats['added'] += 1
+        batch.append((entry, result['page_num']))
+
+        if len(batch) >= batch_size:
+            commit()
+
+    start = time.time()
+    pdfs = list_pdfs(directory)
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        window = workers * 4
+        if vision_client:
+            window = max(window, ocr_chunk)
+        for pdf_path in pdfs:
+            filename = os.path.basename(pdf_path)
+            if checkpoint.is_completed(pdf_path):
+                print(f"⏭️  {filename}: already ingested")
+                continue
+
+            pdf_sha256 = file_sha256(pdf_path)
+            if pdf_sha256 in ingested_pdfs:
+                print(f"⏭️  {filename}: identical to {ingested_pdfs[pdf_sha256]['filename']}, already ingested")
+                continue
+
+            with fitz.open(pdf_path) as doc:
+                total_pages = len(doc)
+            entry = checkpoint.entry(pdf_path, total_pages)
+            added_before = stats['added']
+            done = set(entry['done'])
+            todo = [n for n in range(1, total_pages + 1) if n not in done]
+            print(f"📄 {filename}: {len(todo)} of {total_pages} pages to process")
+
+            # Pages repeated from earlier PDFs, or earlier in this one, are skipped before rendering
+            fingerprints = {}
+            if PAGE_FINGERPRINTS:
+                fingerprint_start = time.perf_counter()
+                with fitz.open(pdf_path) as doc:
+                    image_digests = {}
+                    fingerprints = {n: page_fingerprint(doc[n - 1], image_digests) for n in todo}
+                fingerprint_stats.fingerprint_time += time.perf_counter() - fingerprint_start
+                first_seen = {}
+                for page_num in list(todo):
+                    fingerprint = fingerprints[page_num]
+                    if not fingerprint:
+                        continue  # Couldn't be read, so it's rendered like any other page
+                    with store_lock:
+                        page_id = find_fingerprint(fingerprint)
+                    if page_id:
+                        print(f"   🔁 page {page_num}: same PDF page as page_{page_id}.png, not rendered")
+                    elif fingerprint in first_seen:
+                        print(f"   🔁 page {page_num}: same PDF page as page {first_seen[fingerprint]}, not rendered")
+                    else:
+                        first_seen[fingerprint] = page_num
+                        continue
+                    todo.remove(page_num)
+                    stats['pages'] += 1
+                    stats['duplicates'] += 1
+                    fingerprint_stats.skipped += 1
+                    batch.append((entry, page_num))
+
+            # Keep a bounded window of pages in flight and consume them in page order
+            tasks = iter(todo)
+            in_flight = deque()
+            rendered = []  # Pages waiting for their batched Vision OCR
+            for page_num in tasks:
+                in_flight.append(pool.submit(render_and_ocr, (pdf_path, page_num, zoom, ocr_backend)))
+                if len(in_flight) >= window:
+                    break
+            while in_flight or rendered:
+                if in_flight:
+                    rendered.append(in_flight.popleft().result())
+                    page_num = next(tasks, None)
+                    if page_num is not None:
+                        in_flight.append(pool.submit(render_and_ocr, (pdf_path, page_num, zoom, ocr_backend)))
+                if vision_client:
+                    if len(rendered) < ocr_chunk and in_flight:
+                        continue
+                    stats['vision_fallbacks'] += vision_ocr(rendered, vision_client, pdf_path)
+                ready, rendered = rendered, []
+                for result in ready:
+                    result['fingerprint'] = fingerprints.get(result['page_num'])
+                    file_result(result, entry, filename)
+
+            commit()
+            entry['completed'] = True
+            checkpoint.save()
+            ingested_pdfs[pdf_sha256] = {
+                'filename': filename,
+                'pages_added': stats['added'] - added_before,
+                'ingested_at': datetime.now().isoformat(timespec='seconds')
+            }
+            save_pdf_registry(ingested_pdfs)
+
+    elapsed = time.time() - start
+    rate = stats['pages'] / elapsed if elapsed else 0
+    print(f"\n✅ INGEST COMPLETED: {stats['pages']} pages from {len(pdfs)} PDFs in {elapsed:.1f}s "
+          f"({rate:.2f} pages/sec), {stats['added']} added, {stats['duplicates']} duplicates skipped")
+    if PAGE_FINGERPRINTS:
+        print(fingerprint_stats.summary())
+    if OCR_TWO_PASS and ocr_backend != 'vision':
+        print(f"🔍 Two-pass OCR: {stats['high_res_pages']} of {stats['pages']} pages needed the full-zoom pass")
+    if vision_client:
+        print(f"☁️  Vision: {vision_client.stats['requests']} requests for {vision_client.stats['images']} images, "
+              f"{vision_client.stats['retries']} retries, {stats['vision_fallbacks']} pages OCR'd locally instead")
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-ingest a directory of biodata PDFs into page_data.json")
+    parser.add_argument('directory', help="directory containing the PDFs")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument('--batch-size', type=int, default=25, help="pages per store commit")
+    parser.add_argument('--zoom', type=float, default=RENDER_ZOOM, help="render zoom (3.0 = 300 DPI)")
+    parser.add_argument('--checkpoint', default=CHECKPOINT_PATH, help="checkpoint file used to resume")
+    parser.add_argument('--ocr', choices=['local', 'vision'], default='local',
+                        help="OCR in the workers, or batched Google Vision requests (VISION_* settings)")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.directory):
+        print(f"❌ Not a directory: {args.directory}")
+        return 1
+    try:
+        ingest_directory(args.directory, workers=args.workers, batch_size=args.batch_size,
+                         zoom=args.zoom, checkpoint_path=args.checkpoint, ocr_backend=args.ocr)
+    except StoreInUse as e:
+        print(f"❌ {e}; stop the web server before ingesting")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,128 @@
+import os
+
+from PIL import Image
+
+from extraction import key_field_hits
+from preprocess import parse_steps, preprocess, to_gray
+
+# OCR_EASYOCR=0 keeps to Tesseract, for hosts that can't carry torch (see app_lite.py)
+OCR_EASYOCR = os.getenv('OCR_EASYOCR', '1') != '0'
+
+# Preprocessing (preprocess.py) per backend: comma-separated steps, 'all' or 'none'
+OCR_PREPROCESS = {
+    'tesseract': parse_steps(os.getenv('OCR_PREPROCESS_TESSERACT', 'none')),
+    'easyocr': parse_steps(os.getenv('OCR_PREPROCESS_EASYOCR', 'none')),
+}
+
+# Two-pass OCR: read the page rendered at RENDER_LOW_ZOOM first, and render it again at
+# full zoom only if the mean word confidence or the key fields found (DOB, name) fall short
+OCR_TWO_PASS = os.getenv('OCR_TWO_PASS', '0') == '1'
+OCR_MIN_CONFIDENCE = float(os.getenv('OCR_MIN_CONFIDENCE', '0.75'))
+OCR_MIN_KEY_FIELDS = int(os.getenv('OCR_MIN_KEY_FIELDS', '1'))
+
+# Initialize EasyOCR once per process (faster)
+reader = None
+
+def get_ocr_reader():
+    """The shared EasyOCR reader, or None when EasyOCR is turned off"""
+    global reader
+    if reader is None and OCR_EASYOCR:
+        import easyocr  # Free OCR - works on any hosting; pulls in torch, so only loaded when needed
+        reader = easyocr.Reader(['en'], gpu=False)  # CPU only for compatibility
+    return reader
+
+def ocr_input(backend, image_path, pixels=None, steps=None):
+    """The page as a grayscale array for one backend, preprocessed with its steps"""
+    steps = OCR_PREPROCESS[backend] if steps is None else steps
+    if pixels is None:
+        with Image.open(image_path) as img:
+            pixels = to_gray(img.convert('L'))
+    return preprocess(pixels, steps)[0] if steps else pixels
+
+# Tesseract binary: TESSERACT_CMD, else the default Windows install if it is there,
+# else pytesseract's own default (tesseract on the PATH)
+WINDOWS_TESSERACT = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+TESSERACT_CMD = os.getenv('TESSERACT_CMD') or (WINDOWS_TESSERACT if os.path.exists(WINDOWS_TESSERACT) else None)
+
+def load_tesseract():
+    """pytesseract, pointed at TESSERACT_CMD when one is set"""
+    import pytesseract
+    if TESSERACT_CMD:
+        pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD
+    return pytesseract
+
+TESSERACT_CONFIG = '--oem 3 --psm 6 -c tessedit_char_whitelist=0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz.,/-: '
+
+def tesseract_text(pixels):
+    """Tesseract over a grayscale page; raises if Tesseract isn't installed"""
+    pytesseract = load_tesseract()
+    text = pytesseract.image_to_string(Image.fromarray(pixels), config=TESSERACT_CONFIG)
+    return ' '.join(text.split())
+
+def tesseract_read(pixels):
+    """Tesseract text and mean word confidence (0-1) over a grayscale page"""
+    pytesseract = load_tesseract()
+    data = pytesseract.image_to_data(Image.fromarray(pixels), config=TESSERACT_CONFIG,
+                                     output_type=pytesseract.Output.DICT)
+    # Layout boxes carry a confidence of -1; only words count
+    words = [(word, float(conf)) for word, conf in zip(data['text'], data['conf']) if float(conf) >= 0 and word.strip()]
+    confidence = sum(conf for _, conf in words) / len(words) / 100 if words else 0.0
+    return ' '.join(' '.join(word for word, _ in words).split()), confidence
+
+def easyocr_read(pixels):
+    """EasyOCR text, keeping the words it is at least half sure of, and its mean word confidence"""
+    ocr_results = get_ocr_reader().readtext(pixels,
+                                            width_ths=0.7,
+                                            height_ths=0.7,
+                                            paragraph=False)
+    text = ' '.join([result[1] for result in ocr_results if result[2] > 0.5])
+    confidence = sum(result[2] for result in ocr_results) / len(ocr_results) if ocr_results else 0.0
+    return ' '.join(text.split()), confidence
+
+def easyocr_text(pixels):
+    """EasyOCR over a grayscale page, keeping the words it is at least half sure of"""
+    return easyocr_read(pixels)[0]
+
+def extract_text_hybrid(image_path, pixels=None):
+    """Use Tesseract locally, EasyOCR for deployment
+
+    pixels is the page already in memory (from render_page_to_file), which
+    saves decoding the PNG again.
+    """
+    try:
+        # Try Tesseract first (faster locally)
+        return tesseract_text(ocr_input('tesseract', image_path, pixels))
+    except:
+        # Fallback to EasyOCR (for deployment)
+        if get_ocr_reader() is None:
+            return f"Text from {os.path.basename(image_path)}"
+        return easyocr_text(ocr_input('easyocr', image_path, pixels))
+
+def extract_text_with_confidence(image_path, pixels=None):
+    """extract_text_hybrid plus the mean word confidence, None when no OCR engine ran"""
+    try:
+        return tesseract_read(ocr_input('tesseract', image_path, pixels))
+    except:
+        if get_ocr_reader() is None:
+            return f"Text from {os.path.basename(image_path)}", None
+        return easyocr_read(ocr_input('easyocr', image_path, pixels))
+
+def needs_high_res(text, confidence):
+    """Whether a low-zoom OCR pass is too unsure, or missed too many key fields, to keep"""
+    if confidence is None:
+        return False  # No OCR engine ran; a sharper render won't help
+    return confidence < OCR_MIN_CONFIDENCE or key_field_hits(text) < OCR_MIN_KEY_FIELDS
+
+def extract_text_two_pass(page, image_path, stats=None, low_zoom=None, high_zoom=None):
+    """Render and OCR a PDF page at low zoom, and again at full zoom only when needed
+
+    Returns (text, high_res). The page image left at image_path is whichever
+    render was used, so most pages are also stored at the lower resolution.
+    """
+    from render import RENDER_LOW_ZOOM, RENDER_ZOOM, render_page_to_file
+    pixels = render_page_to_file(page, image_path, stats, keep_pixels=True, zoom=low_zoom or RENDER_LOW_ZOOM)
+    text, confidence = extract_text_with_confidence(image_path, pixels)
+    if not needs_high_res(text, confidence):
+        return text, False
+    pixels = render_page_to_file(page, image_path, stats, keep_pixels=True, zoom=high_zoom or RENDER_ZOOM)
+    return extract_text_with_confidence(image_path, pixels)[0], True
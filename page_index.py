@@ -0,0 +1,369 @@
+import re
+from bisect import bisect_left
+from itertools import chain
+from threading import Lock
+
+import numpy as np
+
+FACETS = ('place', 'birth_year', 'salary_band')
+
+# String fields filtered with substring semantics, stored dictionary-encoded
+CODED_FIELDS = ('dob', 'salary', 'occupation_place', 'native_address')
+
+# Below this many candidates a direct substring check beats a vocabulary scan
+DIRECT_TEXT_CHECK_LIMIT = 256
+
+# Roughly how many posting entries cost as much as one direct substring check
+POSTINGS_PER_TEXT_CHECK = 16
+
+# Characters of context kept either side of a match in a search snippet
+SNIPPET_CONTEXT = 60
+
+# A query word contained in more distinct words than this is located with find() instead;
+# past a few postings lookups per page, scanning the (short) page text is cheaper
+SNIPPET_TOKEN_LIMIT = 8
+
+
+
+def _encode(values):
+    """Dictionary-encode a column: (distinct values, int32 codes with -1 for None)"""
+    distinct = []
+    lookup = {}
+    codes = np.full(len(values), -1, dtype=np.int32)
+    for ordinal, value in enumerate(values):
+        if value is None:
+            continue
+        code = lookup.get(value)
+        if code is None:
+            code = lookup[value] = len(distinct)
+            distinct.append(value)
+        codes[ordinal] = code
+    return distinct, codes
+
+
+def make_snippet(text, offset, needle, context=SNIPPET_CONTEXT):
+    """Window of text around a match at offset, with [start, end] of every match inside it
+
+    needle is lowercase; text may be in either case but must line up with its
+    lowercase form.
+    """
+    start = max(0, offset - context)
+    end = min(len(text), offset + len(needle) + context)
+    # Don't cut words in half at the edges
+    if start > 0:
+        space = text.find(' ', start, offset)
+        if space != -1:
+            start = space + 1
+    if end < len(text):
+        space = text.rfind(' ', offset + len(needle), end)
+        if space != -1:
+            end = space
+    window = text[start:end]
+    lowered = window.lower()
+    highlights = []
+    found = lowered.find(needle)
+    while found != -1:
+        highlights.append([found, found + len(needle)])
+        found = lowered.find(needle, found + len(needle))
+    return {'text': window, 'offset': start, 'highlights': highlights, 'truncated': end < len(text)}
+
+
+def _substring_mask(column, needle, lower=False):
+    """Mask of rows whose value contains needle, testing each distinct value once"""
+    distinct, codes = column
+    # The trailing False is what code -1 (no value) picks up
+    table = np.array([needle in (value.lower() if lower else value) for value in distinct] + [False])
+    return table[codes]
+
+
+class PageIndex:
+    """Columnar in-memory index over page ordinals.
+
+    Every page gets a stable ordinal in insertion order (the same order as
+    page_data). Extracted fields are computed once per page and kept as
+    dictionary-encoded columns, each facet value owns a bitmap (a NumPy bool
+    array over ordinals), and a token index maps each word to the ordinals
+    containing it, with the offset of its first occurrence there. A search
+    is then a handful of mask operations instead of one interpreted
+    iteration per page, and snippets start from the stored offsets.
+    """
+
+    def __init__(self, extract_fields):
+        self._extract_fields = extract_fields
+        self._lock = Lock()
+        self.page_ids = []
+        self.ordinals = {}
+        self.fields = []
+        self.texts = []
+        self._live = []
+        self._postings = {}
+        self._vocabulary = None
+        self._token_matches = {}
+        self._columns = None
+
+    def __len__(self):
+        return len(self.ordinals)
+
+    def add(self, page_id, data):
+        """Extract and index the fields and words of a page, replacing what it had if indexed"""
+        fields = self._extract_fields(data)
+        text = data['text'].lower()
+        with self._lock:
+            ordinal = self.ordinals.get(page_id)
+            if ordinal is None:
+                ordinal = self.ordinals[page_id] = len(self.page_ids)
+                self.page_ids.append(page_id)
+                self.fields.append(fields)
+                self.texts.append(text)
+                self._live.append(True)
+                self._index_tokens(ordinal, text)
+            else:
+                self.fields[ordinal] = fields
+                if text != self.texts[ordinal]:
+                    # Only this page's postings move; every other page keeps its entries
+                    self._unindex_tokens(ordinal, self.texts[ordinal])
+                    self.texts[ordinal] = text
+                    self._index_tokens(ordinal, text)
+            self._columns = None
+
+    def remove(self, page_id):
+        """Drop a page; its ordinal is left as a tombstone so others stay stable"""
+        with self._lock:
+            ordinal = self.ordinals.pop(page_id, None)
+            if ordinal is not None:
+                self._live[ordinal] = False
+                self.fields[ordinal] = None
+                self.texts[ordinal] = ''
+                self._columns = None
+
+    def replace_fields(self, fields_by_id):
+        """Swap in new extracted fields for many pages in one step; their text is unchanged"""
+        with self._lock:
+            for page_id, fields in fields_by_id.items():
+                ordinal = self.ordinals.get(page_id)
+                if ordinal is not None:
+                    self.fields[ordinal] = fields
+            self._columns = None
+
+    def text(self, page_id):
+        """The indexed (lowercase) text of a page"""
+        ordinal = self.ordinals.get(page_id)
+        return self.texts[ordinal] if ordinal is not None else None
+
+    def get(self, page_id):
+        """Return the cached extracted fields for a page"""
+        ordinal = self.ordinals.get(page_id)
+        return self.fields[ordinal] if ordinal is not None else None
+
+    def _index_tokens(self, ordinal, text):
+        # Each word maps to (ordinals, offset in each); ordinals ascend
+        postings = self._postings
+        offset = 0
+        # Distinct words come out in order of first appearance, so each find() starts
+        # where the last one landed. It may land inside a longer word before the real
+        # occurrence, which is still an occurrence and never later than the word itself.
+        for token in dict.fromkeys(text.split()):
+            offset = text.find(token, offset)
+            entry = postings.get(token)
+            if entry is None:
+                postings[token] = ([ordinal], [offset])
+                self._vocabulary = None
+                self._token_matches = {}
+            elif entry[0][-1] < ordinal:
+                entry[0].append(ordinal)
+                entry[1].append(offset)
+            else:
+                # A rewritten page goes back in at its own place among the ordinals
+                i = bisect_left(entry[0], ordinal)
+                entry[0].insert(i, ordinal)
+                entry[1].insert(i, offset)
+
+    def _unindex_tokens(self, ordinal, text):
+        """Take a page's words out of the token index, dropping words no other page has"""
+        postings = self._postings
+        for token in set(text.split()):
+            entry = postings.get(token)
+            if entry is None:
+                continue
+            i = bisect_left(entry[0], ordinal)
+            if i < len(entry[0]) and entry[0][i] == ordinal:
+                del entry[0][i]
+                del entry[1][i]
+                if not entry[0]:
+                    del postings[token]
+                    self._vocabulary = None
+                    self._token_matches = {}
+
+    def _matching_tokens(self, part, prefix, suffix):
+        """Vocabulary words that contain part, anchored at their start and/or end"""
+        if prefix and suffix:
+            return [part] if part in self._postings else []
+        key = (part, prefix, suffix)
+        tokens = self._token_matches.get(key)
+        if tokens is None:
+            if self._vocabulary is None:
+                # One newline-separated string lets the regex engine scan every word in C
+                self._vocabulary = '\n'.join(self._postings)
+            pattern = ('^' if prefix else '^[^\n]*') + re.escape(part) + ('$' if suffix else '[^\n]*$')
+            tokens = re.findall(pattern, self._vocabulary, re.MULTILINE)
+            # Kept until the vocabulary changes, so snippets reuse what the search looked up
+            if len(self._token_matches) >= 256:
+                self._token_matches.clear()
+            self._token_matches[key] = tokens
+        return tokens
+
+    def _build_columns(self):
+        size = len(self.page_ids)
+        fields = [f or {} for f in self.fields]
+        columns = {
+            'page_id': np.array(self.page_ids, dtype=object),
+            'live': np.array(self._live, dtype=bool),
+        }
+        for name in CODED_FIELDS:
+            columns[name] = _encode([f.get(name) for f in fields])
+
+        bitmaps = {}
+        for facet in FACETS:
+            ordinals_by_value = {}
+            for ordinal, f in enumerate(fields):
+                values = f.get(facet)
+                if values is None:
+                    continue
+                if not isinstance(values, list):
+                    values = [values]
+                for value in values:
+                    ordinals_by_value.setdefault(value, []).append(ordinal)
+            values = list(ordinals_by_value)
+            matrix = np.zeros((len(values), size), dtype=bool)
+            for row, value in enumerate(values):
+                matrix[row, ordinals_by_value[value]] = True
+            bitmaps[facet] = (values, {value: row for row, value in enumerate(values)}, matrix)
+        columns['bitmaps'] = bitmaps
+        return columns
+
+    def columns(self):
+        """Return the column table, rebuilding it if pages changed since the last query"""
+        with self._lock:
+            if self._columns is None:
+                self._columns = self._build_columns()
+            return self._columns
+
+    def _text_mask(self, query, candidates):
+        """Narrow candidates to pages containing query as a substring, via the token index"""
+        parts = query.split()
+        if parts and np.count_nonzero(candidates) > DIRECT_TEXT_CHECK_LIMIT:
+            size = len(candidates)
+            for i, part in enumerate(parts):
+                # A query word preceded by whitespace starts a page word, one followed by it ends one
+                prefix = i > 0 or query[0].isspace()
+                suffix = i < len(parts) - 1 or query[-1].isspace()
+                tokens = self._matching_tokens(part, prefix, suffix)
+                postings = [self._postings[t][0] for t in tokens]
+                if sum(map(len, postings)) > POSTINGS_PER_TEXT_CHECK * np.count_nonzero(candidates):
+                    # Short, common words hit most of the corpus; checking the text is cheaper
+                    break
+                # Postings may already hold pages added after the columns were built
+                part_mask = np.zeros(len(self.texts), dtype=bool)
+                part_mask[list(chain.from_iterable(postings))] = True
+                candidates = candidates & part_mask[:size]
+                if not candidates.any():
+                    return candidates
+            else:
+                # A single bare word is exact; phrases still need a check across word gaps
+                if len(parts) == 1 and query == parts[0]:
+                    return candidates
+
+        candidates = candidates.copy()
+        texts = self.texts
+        for ordinal in np.flatnonzero(candidates):
+            if query not in texts[ordinal]:
+                candidates[ordinal] = False
+        return candidates
+
+    def filter_mask(self, query='', dob_filter='', place_filter='', salary_filter='', place=None):
+        """Bool mask over ordinals of the live pages matching the search filters
+
+        place is the canonical gazetteer name when place_filter names a known
+        place (a bitmap lookup); otherwise place_filter is matched as a
+        substring of the extracted occupation place or native address.
+        """
+        columns = self.columns()
+        mask = columns['live'].copy()
+
+        if place:
+            values, rows, matrix = columns['bitmaps']['place']
+            if place in rows:
+                mask &= matrix[rows[place]]
+            else:
+                mask[:] = False
+        elif place_filter:
+            mask &= _substring_mask(columns['occupation_place'], place_filter, lower=True) | \
+                _substring_mask(columns['native_address'], place_filter, lower=True)
+
+        if dob_filter:
+            mask &= _substring_mask(columns['dob'], dob_filter)
+
+        if salary_filter:
+            mask &= _substring_mask(columns['salary'], salary_filter)
+
+        # The text check is the only per-candidate step, so it runs on what is left
+        if query and mask.any():
+            with self._lock:
+                mask = self._text_mask(query, mask)
+
+        return mask
+
+    def match_offsets(self, page_ids, query):
+        """Offset of the first occurrence of query in each page's text, or None
+
+        The first query word is looked up in the token index and its stored
+        word offsets are checked, so a page's text is only scanned when the
+        phrase doesn't continue at the first occurrence of that word.
+        """
+        parts = query.split()
+        if not parts:
+            return {}
+        lead = len(query) - len(query.lstrip())
+        with self._lock:
+            # Same anchoring as _text_mask uses for the first word
+            tokens = self._matching_tokens(parts[0], lead > 0, len(parts) > 1 or query[-1].isspace())
+            use_postings = len(tokens) <= SNIPPET_TOKEN_LIMIT
+            candidates = [(self._postings[t], t.find(parts[0]) - lead) for t in tokens] if use_postings else []
+            offsets = {}
+            for page_id in page_ids:
+                ordinal = self.ordinals.get(page_id)
+                if ordinal is None:
+                    continue
+                text = self.texts[ordinal]
+                offset = None
+                for (ordinals, positions), shift in candidates:
+                    i = bisect_left(ordinals, ordinal)
+                    if i < len(ordinals) and ordinals[i] == ordinal:
+                        position = positions[i] + shift
+                        if offset is None or position < offset:
+                            offset = position
+                if offset is None or offset < 0 or not text.startswith(query, offset):
+                    found = text.find(query)
+                    offset = found if found != -1 else None
+                offsets[page_id] = offset
+            return offsets
+
+    def page_ids_for(self, mask):
+        """Page IDs selected by a mask, in ordinal order"""
+        return list(self.columns()['page_id'][:len(mask)][mask])
+
+    def facet_counts(self, mask, limit=None):
+        """Count pages per facet value within mask as [{value, count}], largest first"""
+        columns = self.columns()
+        mask = mask & columns['live'][:len(mask)]
+        counts = {}
+        for facet, (values, rows, matrix) in columns['bitmaps'].items():
+            if not values:
+                counts[facet] = []
+                continue
+            totals = np.count_nonzero(matrix[:, :len(mask)] & mask, axis=1)
+            order = np.argsort(-totals, kind='stable')
+            if limit:
+                order = order[:limit]
+            counts[facet] = [{'value': values[i], 'count': int(totals[i])} for i in order if totals[i]]
+        return counts
@@ -0,0 +1,224 @@
+import hashlib
+import json
+import os
+import tempfile
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+try:
+    from gevent import monkey
+    _RLock = monkey.get_original('_thread', 'RLock')
+except ImportError:
+    from _thread import RLock as _RLock
+
+PAGE_DATA_PATH = 'page_data.json'
+PAGES_DIR = 'static/pages'
+
+# SHA-256 of every PDF already ingested, so byte-identical re-uploads are rejected up front
+PDF_REGISTRY_PATH = 'ingested_pdfs.json'
+
+# Held by every writer of the store: page ID allocation, moving a page image into
+# place, changes to page_data and its index, and the save. Uploads, re-OCR and
+# re-extraction write from their own OS threads, so this is a real thread lock
+# even under gevent's monkey-patching: nothing that yields to other greenlets
+# (network, sleeps) may run while it is held.
+store_lock = _RLock()
+
+# store_lock only orders the threads of one process. The web app and ingest.py
+# each hold the whole store in memory and save all of it, so a second writing
+# process would overwrite the first one's pages: the process that writes holds
+# an OS lock on this file until it exits (see claim_store).
+STORE_OWNER_LOCK_PATH = PAGE_DATA_PATH + '.lock'
+
+_store_owner = None  # Lock handle, once this process owns the store
+_loaded_versions = {}  # path -> (mtime, size) of the store when it was last loaded or saved
+
+
+class StoreInUse(Exception):
+    """The page store is owned by another process, or changed since this one loaded it"""
+
+
+def read_json(path, default=None):
+    """Read a JSON file, returning default if it doesn't exist yet"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {} if default is None else default
+
+
+def _file_version(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def load_page_data(path=PAGE_DATA_PATH):
+    """Load the page store, or an empty one if it doesn't exist yet"""
+    _loaded_versions[path] = _file_version(path)
+    return read_json(path)
+
+
+def claim_store(path=PAGE_DATA_PATH, lock_path=STORE_OWNER_LOCK_PATH):
+    """Make this process the only one writing the store, until it exits; raises StoreInUse
+
+    Refused while another process owns it, or if the store changed on disk
+    since this process loaded it: saving the copy in memory would drop
+    whatever was added in between. Safe to call again once claimed.
+    """
+    global _store_owner
+    if _store_owner is not None:
+        return
+    handle = acquire_lock(lock_path)
+    if handle is None:
+        raise StoreInUse(f"{path} is being written by another process (the web app or ingest.py)")
+    if path in _loaded_versions and _file_version(path) != _loaded_versions[path]:
+        handle.close()
+        raise StoreInUse(f"{path} changed on disk after it was loaded")
+    _store_owner = handle
+
+
+def write_json_atomic(path, data, indent=2):
+    """Write JSON to a temp file and rename it over path, so readers never see half a file
+
+    Each write gets its own temp file, so concurrent writers never rename
+    each other's half-written files.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix=f'{os.path.basename(path)}.',
+                                    suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=indent)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp makes the file private; keep the permissions the store already had
+        os.chmod(tmp_path, os.stat(path).st_mode & 0o777 if os.path.exists(path) else 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def save_page_data(page_data, path=PAGE_DATA_PATH):
+    """Persist the whole page store in one atomic write, under the store lock"""
+    with store_lock:
+        write_json_atomic(path, page_data)
+        _loaded_versions[path] = _file_version(path)
+
+
+def load_pdf_registry(path=PDF_REGISTRY_PATH):
+    """{sha256: {filename, pages_added, ingested_at}} of PDFs already ingested"""
+    return read_json(path)
+
+
+def save_pdf_registry(registry, path=PDF_REGISTRY_PATH):
+    write_json_atomic(path, registry)
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """SHA-256 of a file, read in chunks"""
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def page_image_path(page_id):
+    return f'{PAGES_DIR}/page_{page_id}.png'
+
+
+def next_page_id(page_data, reserved=()):
+    """Next free page ID: above every stored ID and not taken by an image on disk"""
+    ids = [int(page_id) for page_id in page_data if page_id.isdigit()]
+    ids.extend(int(page_id) for page_id in reserved)
+    page_id = max(ids, default=0) + 1
+    while os.path.exists(page_image_path(page_id)):
+        page_id += 1
+    return str(page_id)
+
+
+def acquire_lock(path):
+    """Take an exclusive, non-blocking file lock; returns the handle or None if held elsewhere
+
+    The OS drops the lock if the holding process dies, so a crashed worker
+    never leaves work locked.
+    """
+    handle = open(path, 'a+')
+    try:
+        if fcntl:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        handle.close()
+        return None
+    return handle
+
+
+def release_lock(handle, path):
+    handle.close()
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class IngestCheckpoint:
+    """Per-PDF, per-page progress of an ingest, persisted next to the store
+
+    pending lists page IDs whose images were moved into place but whose
+    records may not have reached the store yet; a resumed run removes any of
+    those images that the store doesn't know about. meta holds whatever the
+    caller needs to restart the work.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        data = read_json(path)
+        self.pdfs = data.get('pdfs', {})
+        self.pending = data.get('pending', [])
+        self.meta = data.get('meta', {})
+
+    def key(self, pdf_path):
+        return f'{os.path.basename(pdf_path)}:{os.path.getsize(pdf_path)}'
+
+    def entry(self, pdf_path, total_pages):
+        entry = self.pdfs.setdefault(self.key(pdf_path), {'done': [], 'completed': False})
+        entry['total_pages'] = total_pages
+        return entry
+
+    def is_completed(self, pdf_path):
+        return self.pdfs.get(self.key(pdf_path), {}).get('completed', False)
+
+    def recover(self, page_data):
+        """Undo pages whose commit never reached the store; returns their page IDs
+
+        Their images are deleted, and the caller must forget the IDs: once
+        the images are gone another upload can be given them.
+        """
+        removed = []
+        for page_id in self.pending:
+            if page_id in page_data:
+                continue
+            path = page_image_path(page_id)
+            if os.path.exists(path):
+                os.remove(path)
+            removed.append(page_id)
+        self.pending = []
+        return removed
+
+    def save(self):
+        write_json_atomic(self.path, {'pdfs': self.pdfs, 'pending': self.pending, 'meta': self.meta}, indent=None)
+
+    def delete(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,260 @@
+import os
+import time
+
+import numpy as np
+
+# OCR preprocessing on the in-memory page: every step is a handful of NumPy
+# array operations over a uint8 grayscale image (0 = ink, 255 = paper)
+PREPROCESS_STEPS = ('crop', 'deskew', 'downscale', 'binarize', 'despeckle')
+
+BORDER_INK_FRACTION = 0.6  # An edge row/column this dark is scanner border, not content
+MARGIN_INK_FRACTION = 0.01  # Rows/columns with less ink than this (speckle, not text) count as blank margin
+CROP_PADDING = 32  # Tesseract wants some white round the text, and deskew shifts it
+MAX_SKEW_DEGREES = 5.0
+SKEW_STEP_DEGREES = 0.2
+SKEW_SAMPLE_PIXELS = 40000  # Ink pixels sampled to estimate the skew angle
+TARGET_X_HEIGHT = float(os.getenv('OCR_TARGET_X_HEIGHT', '20'))  # Pixels; Tesseract reads best around 20
+BINARIZE_WINDOW = 31  # Side of the local-mean window, a few x-heights at the target size
+BINARIZE_OFFSET = 10  # Ink must be this much darker than its neighbourhood
+SPECK_WINDOW = 5
+SPECK_MAX_PIXELS = 4  # Ink whose 5x5 neighbourhood holds no more than this is dropped
+BAND_ROWS = 512  # Full-size temporaries are built this many rows at a time
+
+
+def parse_steps(value):
+    """Steps named in a setting: comma-separated names, 'all' or 'none'"""
+    value = (value or '').strip().lower()
+    if value in ('', 'none', '0'):
+        return ()
+    if value in ('all', '1'):
+        return PREPROCESS_STEPS
+    steps = tuple(step.strip() for step in value.split(',') if step.strip())
+    unknown = [step for step in steps if step not in PREPROCESS_STEPS]
+    if unknown:
+        raise ValueError(f"Unknown preprocessing steps {unknown}; choose from {', '.join(PREPROCESS_STEPS)}")
+    return steps
+
+
+def to_gray(image):
+    """uint8 grayscale array from a PyMuPDF pixmap, a PIL image or an array"""
+    if hasattr(image, 'samples'):
+        pixels = np.frombuffer(image.samples, dtype=np.uint8).reshape(image.height, image.width, image.n)
+    else:
+        pixels = np.asarray(image)
+    if pixels.ndim == 3:
+        if pixels.shape[2] == 1:
+            pixels = pixels[:, :, 0]
+        else:
+            pixels = (pixels[:, :, :3] @ np.array([0.299, 0.587, 0.114])).astype(np.uint8)
+    return np.ascontiguousarray(pixels, dtype=np.uint8)
+
+
+def otsu_threshold(gray):
+    """Global threshold that best separates ink from paper in the histogram"""
+    hist = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    weight_dark = np.cumsum(hist)
+    weight_light = gray.size - weight_dark
+    total = np.cumsum(hist * np.arange(256))
+    mean_dark = total / np.maximum(weight_dark, 1)
+    mean_light = (total[-1] - total) / np.maximum(weight_light, 1)
+    return int(np.argmax(weight_dark * weight_light * (mean_dark - mean_light) ** 2))
+
+
+def ink_mask(gray):
+    return gray <= otsu_threshold(gray)
+
+
+def _integral(gray):
+    """Summed-area table with a zero first row and column"""
+    dtype = np.uint32 if gray.size * 255 < 2 ** 32 else np.int64
+    integral = np.zeros((gray.shape[0] + 1, gray.shape[1] + 1), dtype=dtype)
+    np.cumsum(gray, axis=0, dtype=dtype, out=integral[1:, 1:])
+    np.cumsum(integral[1:, 1:], axis=1, dtype=dtype, out=integral[1:, 1:])
+    return integral
+
+
+def _window_sums(integral, y0, y1, x0, x1):
+    """Sums over the boxes [y0, y1) x [x0, x1), for row and column edge vectors"""
+    y0, y1 = y0[:, None], y1[:, None]
+    return (integral[y1, x1].astype(np.int64) - integral[y0, x1] - integral[y1, x0] + integral[y0, x0])
+
+
+def _clipped_windows(size, radius):
+    centres = np.arange(size)
+    return np.clip(centres - radius, 0, size), np.clip(centres + radius + 1, 0, size)
+
+
+def _span(profile, border_fraction, margin_fraction, padding):
+    """Start and end of the content along one axis of an ink profile"""
+    not_border = np.flatnonzero(profile < border_fraction)
+    if not not_border.size:
+        return 0, len(profile)
+    start, end = not_border[0], not_border[-1] + 1
+    inked = np.flatnonzero(profile[start:end] > margin_fraction)
+    if not inked.size:
+        return start, end
+    return max(start, start + inked[0] - padding), min(end, start + inked[-1] + 1 + padding)
+
+
+def crop_bounds(ink, border_fraction=BORDER_INK_FRACTION, margin_fraction=MARGIN_INK_FRACTION, padding=CROP_PADDING):
+    """(top, bottom, left, right) of the page content, without dark scan borders or blank margins"""
+    top, bottom = _span(ink.mean(axis=1), border_fraction, margin_fraction, padding)
+    left, right = _span(ink[top:bottom].mean(axis=0), border_fraction, margin_fraction, padding)
+    # Border columns darken every row a little; measure the rows again without them
+    top, bottom = _span(ink[:, left:right].mean(axis=1), border_fraction, margin_fraction, padding)
+    return top, bottom, left, right
+
+
+def estimate_skew(ink, max_angle=MAX_SKEW_DEGREES, step=SKEW_STEP_DEGREES, sample=SKEW_SAMPLE_PIXELS):
+    """Angle in degrees that text lines slope down to the right, by projection profiles
+
+    Sampled ink pixels are sheared by every candidate angle at once; the
+    angle whose row histogram has the sharpest peaks lines the text up.
+    """
+    ys, xs = np.nonzero(ink)
+    if ys.size < 100:
+        return 0.0
+    if ys.size > sample:
+        pick = np.random.default_rng(0).choice(ys.size, sample, replace=False)
+        ys, xs = ys[pick], xs[pick]
+    angles = np.round(np.arange(-max_angle, max_angle + step / 2, step), 3)
+    rows = np.rint(ys[None, :] - xs[None, :] * np.tan(np.radians(angles))[:, None]).astype(np.int64)
+    rows -= rows.min()
+    height = int(rows.max()) + 1
+    rows += np.arange(len(angles))[:, None] * height
+    hist = np.bincount(rows.ravel(), minlength=len(angles) * height).reshape(len(angles), height)
+    scores = (hist.astype(np.float64) ** 2).sum(axis=1)
+    return float(angles[np.argmax(scores)])
+
+
+def rotate(gray, degrees):
+    """Rotate about the centre, nearest neighbour, keeping the size; rotate(img, a) undoes a skew of a
+
+    Corners rotated in from outside repeat the nearest edge pixel, so they
+    match the paper (shaded or not) and binarisation sees no new edge.
+    """
+    h, w = gray.shape
+    theta = np.radians(degrees)
+    cos, sin = np.float32(np.cos(theta)), np.float32(np.sin(theta))
+    cy, cx = (h - 1) / 2, (w - 1) / 2
+    dx = np.arange(w, dtype=np.float32) - cx
+    out = np.empty_like(gray)
+    for start in range(0, h, BAND_ROWS):
+        dy = np.arange(start, min(start + BAND_ROWS, h), dtype=np.float32)[:, None] - cy
+        src_x = np.clip(np.rint(cx + dx * cos - dy * sin).astype(np.int64), 0, w - 1)
+        src_y = np.clip(np.rint(cy + dx * sin + dy * cos).astype(np.int64), 0, h - 1)
+        out[start:start + src_x.shape[0]] = gray[src_y, src_x]
+    return out
+
+
+def estimate_x_height(ink):
+    """Median height in pixels of the dense core band of each text line, or None
+
+    Ascenders and descenders are sparse, so the rows of a line holding at
+    least half its peak ink are the x-height band.
+    """
+    rows = ink.sum(axis=1)
+    inked = rows > max(2, 0.005 * ink.shape[1])
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], inked.astype(np.int8), [0]))))
+    heights = []
+    for start, end in zip(edges[::2], edges[1::2]):
+        if end - start < 4:
+            continue
+        line = rows[start:end]
+        heights.append(np.count_nonzero(line >= line.max() / 2))
+    return float(np.median(heights)) if heights else None
+
+
+def downscale(gray, scale):
+    """Area-average resize by scale (< 1), from one summed-area table"""
+    h, w = gray.shape
+    ys = np.linspace(0, h, max(1, round(h * scale)) + 1).astype(np.int64)
+    xs = np.linspace(0, w, max(1, round(w * scale)) + 1).astype(np.int64)
+    sums = _window_sums(_integral(gray), ys[:-1], ys[1:], xs[:-1], xs[1:])
+    area = np.diff(ys)[:, None] * np.diff(xs)[None, :]
+    return (sums // area).astype(np.uint8)
+
+
+def binarize(gray, window=BINARIZE_WINDOW, offset=BINARIZE_OFFSET):
+    """Adaptive threshold: ink where a pixel is darker than its local mean by offset
+
+    Unlike one global threshold this survives uneven lighting, shadows near
+    the spine and faded photocopies.
+    """
+    h, w = gray.shape
+    integral = _integral(gray)
+    y0, y1 = _clipped_windows(h, window // 2)
+    x0, x1 = _clipped_windows(w, window // 2)
+    widths = (x1 - x0)[None, :]
+    out = np.empty_like(gray)
+    for start in range(0, h, BAND_ROWS):
+        band = slice(start, min(start + BAND_ROWS, h))
+        sums = _window_sums(integral, y0[band], y1[band], x0, x1)
+        area = (y1[band] - y0[band])[:, None] * widths
+        # gray < mean - offset, kept in integers: gray * area < sums - offset * area
+        ink = gray[band].astype(np.int64) * area < sums - offset * area
+        out[band] = np.where(ink, 0, 255)
+    return out
+
+
+def despeckle(ink, window=SPECK_WINDOW, max_pixels=SPECK_MAX_PIXELS):
+    """Drop ink pixels whose neighbourhood holds no more than max_pixels of ink"""
+    h, w = ink.shape
+    integral = _integral(ink.view(np.uint8))
+    y0, y1 = _clipped_windows(h, window // 2)
+    x0, x1 = _clipped_windows(w, window // 2)
+    keep = np.empty_like(ink)
+    for start in range(0, h, BAND_ROWS):
+        band = slice(start, min(start + BAND_ROWS, h))
+        keep[band] = ink[band] & (_window_sums(integral, y0[band], y1[band], x0, x1) > max_pixels)
+    return keep
+
+
+def preprocess(image, steps=PREPROCESS_STEPS, target_x_height=TARGET_X_HEIGHT):
+    """Run the chosen steps over a page image; returns (uint8 grayscale array, info)
+
+    Steps always run in PREPROCESS_STEPS order: geometry is fixed on the
+    full-resolution page, and the thresholding steps then work on the
+    smaller downscaled one. info has each step's time and what it found.
+    """
+    gray = to_gray(image)
+    info = {'input_size': [gray.shape[1], gray.shape[0]], 'times': {}}
+    ink = None
+
+    def current_ink():
+        nonlocal ink
+        if ink is None:
+            ink = ink_mask(gray)
+        return ink
+
+    for step in PREPROCESS_STEPS:
+        if step not in steps:
+            continue
+        start = time.perf_counter()
+        if step == 'crop':
+            top, bottom, left, right = crop_bounds(current_ink())
+            gray, ink = gray[top:bottom, left:right], ink[top:bottom, left:right]
+            info['crop'] = [int(left), int(top), int(right), int(bottom)]
+        elif step == 'deskew':
+            angle = estimate_skew(current_ink())
+            if angle:
+                gray, ink = rotate(gray, angle), None
+            info['skew_degrees'] = angle
+        elif step == 'downscale':
+            x_height = estimate_x_height(current_ink())
+            info['x_height'] = x_height
+            if x_height and x_height > target_x_height * 1.2:
+                scale = target_x_height / x_height
+                gray, ink = downscale(gray, scale), None
+                info['scale'] = round(scale, 3)
+        elif step == 'binarize':
+            gray = binarize(gray)
+            ink = gray == 0
+        elif step == 'despeckle':
+            cleaned = despeckle(current_ink())
+            info['specks_removed'] = int(np.count_nonzero(ink) - np.count_nonzero(cleaned))
+            gray = np.where(ink & ~cleaned, 255, gray).astype(np.uint8)
+            ink = cleaned
+        info['times'][step] = time.perf_counter() - start
+    info['output_size'] = [gray.shape[1], gray.shape[0]]
+    return gray, info
@@ -0,0 +1,113 @@
+import cProfile
+import hmac
+import io
+import os
+import pstats
+import re
+import threading
+import time
+from datetime import datetime
+
+# Opt-in profiling of single requests and uploads. With PROFILING=1 a /search
+# request carrying an X-Profile header or ?profile= parameter, or an upload started
+# by one, runs under cProfile and is saved to PROFILE_DIR. The value is 1, true or
+# yes, or with PROFILE_TOKEN set, that token. The admin endpoints that list and
+# serve the saved profiles always need the token, and are off without one. With
+# PROFILING unset nothing here is wrapped round any view or upload.
+PROFILING = os.getenv('PROFILING') == '1'
+PROFILE_TOKEN = os.getenv('PROFILE_TOKEN', '')
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+PROFILE_KEEP = int(os.getenv('PROFILE_KEEP', '20'))  # Older profiles are deleted
+PROFILE_TEXT_LINES = 60  # Functions listed in a text report
+
+PROFILE_NAME = re.compile(r'^[\w-]+\.prof$')
+PROFILE_FLAGS = ('1', 'true', 'yes')
+
+# cProfile can run in one thread at a time on newer Pythons; a second request
+# asking for a profile while one runs is served unprofiled
+_profile_lock = threading.Lock()
+
+
+def token_ok(value):
+    """Whether value is PROFILE_TOKEN; never true when no token is set"""
+    return bool(PROFILE_TOKEN) and hmac.compare_digest((value or '').encode(), PROFILE_TOKEN.encode())
+
+
+def wants_profile(value):
+    """Whether a header or parameter value asks for a profile: the token if one is set, else 1/true/yes"""
+    if not PROFILING or not value:
+        return False
+    if PROFILE_TOKEN:
+        return token_ok(value)
+    return value.strip().lower() in PROFILE_FLAGS
+
+
+def profile_call(label, func, *args, **kwargs):
+    """Run func under cProfile and save the profile; returns (result, profile name or None)"""
+    if not _profile_lock.acquire(blocking=False):
+        return func(*args, **kwargs), None
+    profiler = cProfile.Profile()
+    start = time.perf_counter()
+    try:
+        result = profiler.runcall(func, *args, **kwargs)
+    finally:
+        _profile_lock.release()
+        elapsed = time.perf_counter() - start
+        name = save_profile(profiler, label)
+        print(f"📈 Profiled {label} ({elapsed:.2f}s): {os.path.join(PROFILE_DIR, name)}")
+    return result, name
+
+
+def save_profile(profiler, label):
+    """Write a profile as <label>-<timestamp>.prof and drop the oldest beyond PROFILE_KEEP"""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    name = f"{label}-{datetime.now():%Y%m%d-%H%M%S-%f}.prof"
+    profiler.dump_stats(os.path.join(PROFILE_DIR, name))
+    for old in profile_names()[PROFILE_KEEP:]:
+        try:
+            os.remove(os.path.join(PROFILE_DIR, old))
+        except OSError:
+            pass
+    return name
+
+
+def profile_names():
+    """Names of the saved profiles, newest first"""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    names = [name for name in os.listdir(PROFILE_DIR) if PROFILE_NAME.match(name)]
+    return sorted(names, key=lambda name: name.split('-', 1)[-1], reverse=True)
+
+
+def list_profiles():
+    """Saved profiles, newest first, with their size and total profiled time"""
+    profiles = []
+    for name in profile_names():
+        path = os.path.join(PROFILE_DIR, name)
+        try:
+            total_time = round(pstats.Stats(path).total_tt, 3)
+        except Exception:
+            total_time = None
+        profiles.append({
+            'name': name,
+            'label': name.split('-')[0],
+            'size': os.path.getsize(path),
+            'created': datetime.fromtimestamp(os.path.getmtime(path)).isoformat(timespec='seconds'),
+            'total_time': total_time
+        })
+    return profiles
+
+
+def profile_path(name):
+    """Path of a saved profile, or None if the name isn't one"""
+    if not PROFILE_NAME.match(name or ''):
+        return None
+    path = os.path.join(PROFILE_DIR, name)
+    return path if os.path.exists(path) else None
+
+
+def profile_report(path, sort='cumulative', lines=PROFILE_TEXT_LINES):
+    """pstats text report of a saved profile"""
+    out = io.StringIO()
+    pstats.Stats(path, stream=out).sort_stats(sort).print_stats(lines)
+    return out.getvalue()
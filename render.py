@@ -0,0 +1,96 @@
+import os
+import time
+
+import fitz  # PyMuPDF - works on any hosting
+
+from preprocess import to_gray
+
+# Render settings, overridable from the environment
+RENDER_ZOOM = float(os.getenv('RENDER_ZOOM', '3.0'))  # 3x zoom = 300 DPI
+RENDER_LOW_ZOOM = float(os.getenv('RENDER_LOW_ZOOM', '2.0'))  # First pass of two-pass OCR (OCR_TWO_PASS)
+RENDER_MEMORY_BUDGET_MB = float(os.getenv('RENDER_MEMORY_BUDGET_MB', '64'))
+RENDER_GRAYSCALE = os.getenv('RENDER_GRAYSCALE', '1') != '0'
+RENDER_CLIP_CONTENT = os.getenv('RENDER_CLIP_CONTENT', '0') == '1'
+
+# Padding (in PDF points) kept around the content bounding box when clipping
+CLIP_MARGIN = 12
+
+
+def content_bbox(page, margin=CLIP_MARGIN):
+    """Bounding box of everything drawn on a page (text, images, vectors), padded"""
+    bbox = fitz.Rect()
+    for _, rect in page.get_bboxlog():
+        rect = fitz.Rect(rect)
+        if not rect.is_empty:
+            bbox |= rect
+    if bbox.is_empty:
+        return page.rect
+    bbox = fitz.Rect(bbox.x0 - margin, bbox.y0 - margin, bbox.x1 + margin, bbox.y1 + margin)
+    return bbox & page.rect
+
+
+def render_page(page, zoom=RENDER_ZOOM, budget_mb=RENDER_MEMORY_BUDGET_MB,
+                grayscale=RENDER_GRAYSCALE, clip_content=RENDER_CLIP_CONTENT):
+    """Render a page to a pixmap, lowering the zoom if it would exceed the memory budget"""
+    clip = content_bbox(page) if clip_content else page.rect
+    channels = 1 if grayscale else 3
+    budget_bytes = budget_mb * 1024 * 1024
+    pixmap_bytes = clip.width * zoom * clip.height * zoom * channels
+    if pixmap_bytes > budget_bytes:
+        zoom *= (budget_bytes / pixmap_bytes) ** 0.5
+    colorspace = fitz.csGRAY if grayscale else fitz.csRGB
+    return page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=colorspace, clip=clip, alpha=False)
+
+
+def current_rss_bytes():
+    """Resident set size of this process, or None where it can't be read"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        return None
+
+
+class RenderStats:
+    """Render time and peak RSS across the pages of one upload"""
+
+    def __init__(self):
+        self.render_time = 0.0
+        self.pages = 0
+        self.peak_rss = current_rss_bytes()
+
+    def sample(self):
+        rss = current_rss_bytes()
+        if rss is not None and (self.peak_rss is None or rss > self.peak_rss):
+            self.peak_rss = rss
+
+    def as_dict(self):
+        return {
+            'render_time': round(self.render_time, 2),
+            'render_time_per_page': round(self.render_time / self.pages, 3) if self.pages else 0,
+            'peak_rss_mb': round(self.peak_rss / 1024 / 1024, 1) if self.peak_rss else None
+        }
+
+
+def render_page_to_file(page, path, stats=None, keep_pixels=False, **options):
+    """Render a page straight to a PNG and free the pixmap before returning
+
+    With keep_pixels the page comes back as a grayscale array for OCR,
+    instead of the path, so it isn't decoded from the PNG again.
+    """
+    start = time.time()
+    pix = render_page(page, **options)
+    if stats is not None:
+        stats.sample()
+    pix.save(path)
+    pixels = to_gray(pix) if keep_pixels else None
+    pix = None
+    if stats is not None:
+        stats.render_time += time.time() - start
+        stats.pages += 1
+    return pixels if keep_pixels else path
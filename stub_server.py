@@ -0,0 +1,201 @@
+import argparse
+import base64
+import gzip
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+# Local stand-in for the Google Vision images:annotate endpoint and for the
+# page image URLs Cloudinary serves, so the cloud OCR client and the page
+# downloader's batching, concurrency and retries can be exercised offline
+WORDS = ['name', 'father', 'mother', 'born', 'engineer', 'software', 'teacher', 'doctor', 'salary',
+         'lakhs', 'native', 'place', 'hyderabad', 'guntur', 'vijayawada', 'bangalore', 'height', 'caste',
+         'gothram', 'star', 'education', 'b.tech', 'm.tech', 'mba', 'working', 'company', 'address']
+
+
+def fake_text(image_bytes, words=40):
+    """Deterministic page text derived from the image, so equal images read the same"""
+    rng = random.Random(hashlib.md5(image_bytes).hexdigest())
+    return ' '.join(f"{rng.choice(WORDS)}{rng.randint(0, 9999)}" for _ in range(words))
+
+
+def fake_file(name, size):
+    """Deterministic file body for a download URL, so a test can check every byte"""
+    seed = hashlib.md5(name.encode()).digest()
+    return (seed * (size // len(seed) + 1))[:size]
+
+
+class StubState:
+    def __init__(self, latency=0.05, per_image_latency=0.01, fail_rate=0.0, rate_limit=0, max_batch=16,
+                 truncate_rate=0.0, file_size=256 * 1024, gzip=False, seed=None):
+        self.latency = latency  # Seconds per request
+        self.per_image_latency = per_image_latency  # Extra seconds per image in the request
+        self.fail_rate = fail_rate  # Fraction of requests answered with 503
+        self.rate_limit = rate_limit  # Requests per second before answering 429, 0 = unlimited
+        self.max_batch = max_batch  # Larger batches are rejected with 400, like the real API
+        self.truncate_rate = truncate_rate  # Fraction of downloads cut off halfway through the body
+        self.file_size = file_size  # Bytes per download unless the URL asks for ?size=N
+        self.gzip = gzip  # Send downloads with Content-Encoding: gzip, as CDNs may
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.window = []
+        self.stats = {'requests': 0, 'images': 0, 'rejected_429': 0, 'failed_503': 0, 'connections': 0,
+                      'downloads': 0, 'truncated': 0}
+
+    def admit(self):
+        """Return the status to answer this request with"""
+        with self.lock:
+            self.stats['requests'] += 1
+            if self.rate_limit:
+                now = time.monotonic()
+                self.window = [t for t in self.window if now - t < 1]
+                if len(self.window) >= self.rate_limit:
+                    self.stats['rejected_429'] += 1
+                    return 429
+                self.window.append(now)
+            if self.fail_rate and self.random.random() < self.fail_rate:
+                self.stats['failed_503'] += 1
+                return 503
+        return 200
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep-alive, so connection reuse shows in the stats
+    disable_nagle_algorithm = True  # Headers and body go out as separate writes
+
+    def setup(self):
+        super().setup()
+        with self.server.state.lock:
+            self.server.state.stats['connections'] += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        path, _, query = self.path.partition('?')
+        if path == '/stats':
+            with self.server.state.lock:
+                self.send_json(200, dict(self.server.state.stats))
+        elif path.startswith('/files/'):
+            self.send_file(path[len('/files/'):], parse_qs(query))
+        else:
+            self.send_json(404, {'error': {'message': 'not found'}})
+
+    def send_file(self, name, params):
+        """GET /files/<name>[?size=N]: a page image download, possibly failed or cut short"""
+        state = self.server.state
+        status = state.admit()
+        if status != 200:
+            headers = {'Retry-After': '1'} if status == 429 else None
+            self.send_json(status, {'error': {'code': status}}, headers)
+            return
+        body = fake_file(name, int(params.get('size', [state.file_size])[0]))
+        with state.lock:
+            truncate = state.truncate_rate and state.random.random() < state.truncate_rate
+            state.stats['truncated' if truncate else 'downloads'] += 1
+
+        time.sleep(state.latency)
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/png')
+        if state.gzip:
+            body = gzip.compress(body)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if truncate:
+            # Promise the whole body, send half and hang up, like a dropped connection
+            self.wfile.write(body[:len(body) // 2])
+            self.close_connection = True
+            return
+        for i in range(0, len(body), 64 * 1024):
+            self.wfile.write(body[i:i + 64 * 1024])
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if not self.path.split('?')[0].endswith('images:annotate'):
+            self.send_json(404, {'error': {'message': 'not found'}})
+            return
+        state = self.server.state
+        status = state.admit()
+        if status == 429:
+            self.send_json(429, {'error': {'code': 429, 'message': 'Quota exceeded'}}, {'Retry-After': '1'})
+            return
+        if status == 503:
+            self.send_json(503, {'error': {'code': 503, 'message': 'Service unavailable'}})
+            return
+
+        try:
+            requests_ = json.loads(body)['requests']
+        except (ValueError, KeyError):
+            self.send_json(400, {'error': {'code': 400, 'message': 'Invalid JSON payload'}})
+            return
+        if len(requests_) > state.max_batch:
+            self.send_json(400, {'error': {'code': 400, 'message': f'At most {state.max_batch} images per request'}})
+            return
+
+        time.sleep(state.latency + state.per_image_latency * len(requests_))
+        responses = []
+        for request in requests_:
+            try:
+                image = base64.b64decode(request['image']['content'])
+            except (KeyError, ValueError):
+                responses.append({'error': {'code': 3, 'message': 'Bad image data'}})
+                continue
+            responses.append({'fullTextAnnotation': {'text': fake_text(image)}})
+        with state.lock:
+            state.stats['images'] += len(requests_)
+        self.send_json(200, {'responses': responses})
+
+
+def start_stub_server(port=0, **settings):
+    """Serve the stub on a daemon thread; returns the server, its URL is server.url"""
+    server = ThreadingHTTPServer(('127.0.0.1', port), StubHandler)
+    server.daemon_threads = True
+    server.state = StubState(**settings)
+    server.url = f'http://127.0.0.1:{server.server_address[1]}'
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local stand-in for the cloud OCR API")
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--latency', type=float, default=0.05, help="seconds per request")
+    parser.add_argument('--per-image-latency', type=float, default=0.01, help="extra seconds per image")
+    parser.add_argument('--fail-rate', type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument('--rate-limit', type=float, default=0, help="requests per second before 429s")
+    parser.add_argument('--max-batch', type=int, default=16, help="images per request before 400s")
+    parser.add_argument('--truncate-rate', type=float, default=0.0, help="fraction of downloads cut short")
+    parser.add_argument('--file-size', type=int, default=256 * 1024, help="bytes per /files/ download")
+    parser.add_argument('--gzip', action='store_true', help="send /files/ downloads gzip-encoded")
+    args = parser.parse_args(argv)
+
+    server = start_stub_server(args.port, latency=args.latency, per_image_latency=args.per_image_latency,
+                               fail_rate=args.fail_rate, rate_limit=args.rate_limit, max_batch=args.max_batch,
+                               truncate_rate=args.truncate_rate, file_size=args.file_size, gzip=args.gzip)
+    print(f"🧪 Stub OCR API on {server.url}/v1/images:annotate (stats at {server.url}/stats)")
+    print(f"   Point the client at it with VISION_URL={server.url}/v1/images:annotate")
+    print(f"   Page image downloads from {server.url}/files/<name>[?size=N]")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+import fitz
+
+from fingerprint import page_fingerprint
+
+
+def fingerprints(doc):
+    cache = {}
+    return [page_fingerprint(page, cache) for page in doc]
+
+
+def image_page(doc, color, text=None):
+    """A page drawing one solid-colour image, and optionally a line of text"""
+    page = doc.new_page(width=200, height=200)
+    pixmap = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 20, 20), False)
+    pixmap.set_rect(pixmap.irect, color)
+    page.insert_image(fitz.Rect(0, 0, 100, 100), pixmap=pixmap)
+    if text:
+        page.insert_text((20, 150), text)
+    return page
+
+
+def form_wrapped(source, order):
+    """Each source page drawn through a form XObject, as show_pdf_page and merging tools do"""
+    doc = fitz.open()
+    for number in order:
+        page = doc.new_page(width=200, height=200)
+        page.show_pdf_page(page.rect, source, number)
+    return fitz.open('pdf', doc.tobytes())
+
+
+def colour_pages():
+    source = fitz.open()
+    image_page(source, (255, 0, 0), 'Name: Ravi')
+    image_page(source, (0, 0, 255), 'Name: Ravi')
+    return source
+
+
+def test_form_wrapped_pages_differ_by_what_the_form_draws():
+    # Each page is a single form with a nested form and image of the same names
+    red, blue = fingerprints(form_wrapped(colour_pages(), [0, 1]))
+    assert red and blue and red != blue
+
+
+def test_form_wrapped_page_matches_itself():
+    first, second = fingerprints(form_wrapped(colour_pages(), [0, 0]))
+    assert first == second
+
+
+def test_reexports_match():
+    doc = form_wrapped(colour_pages(), [0, 1])
+    original = fingerprints(doc)
+    reexport = fitz.open('pdf', doc.tobytes(garbage=4, deflate=True))
+    assert fingerprints(reexport) == original
+    merged = fitz.open()
+    merged.insert_pdf(reexport, from_page=1, to_page=0)  # Reversed
+    assert fingerprints(fitz.open('pdf', merged.tobytes(garbage=3))) == original[::-1]
+
+
+def test_annotations_count():
+    doc = colour_pages()
+    doc.delete_page(1)
+    plain = page_fingerprint(doc[0])
+    doc[0].add_text_annot((150, 20), 'checked')
+    doc = fitz.open('pdf', doc.tobytes())
+    assert page_fingerprint(doc[0]) != plain
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,148 @@
+import json
+import math
+import os
+import shutil
+import uuid
+
+try:
+    from gevent import monkey
+    Lock = monkey.get_original('_thread', 'allocate_lock')
+except ImportError:
+    from _thread import allocate_lock as Lock
+
+# Deep-zoom tile pyramids, built from page_N.png in the background on first request
+# and cached on disk. Builds run on OS threads, so the locks are real thread locks
+# even under gevent's monkey-patching.
+TILES_DIR = os.path.join('static', 'tiles')
+TILE_SIZE = 256
+TILE_QUALITY = 80
+PREVIEW_WIDTH = 800  # The detail page opens on this single low-resolution image
+
+_build_locks = {}
+_build_locks_guard = Lock()
+_building = set()  # Page IDs with a background build queued or running
+
+
+def tile_dir(page_id):
+    return os.path.join(TILES_DIR, str(page_id))
+
+
+def tile_path(page_id, level, x, y):
+    return os.path.join(tile_dir(page_id), str(level), f'{x}_{y}.jpg')
+
+
+def preview_path(page_id):
+    return os.path.join(tile_dir(page_id), 'preview.jpg')
+
+
+def _save_jpeg(img, path):
+    img.save(path, 'JPEG', quality=TILE_QUALITY, optimize=True)
+
+
+def build_pyramid(image_path, out_dir):
+    """Write the preview, every tile level and info.json for one page image
+
+    Level 0 fits in a single tile and the last level is the full-resolution
+    image; each level is half the size of the next. Everything is written to
+    a scratch directory first so a half-built pyramid is never served.
+    """
+    from PIL import Image  # Only needed to build; cached tiles are served as files
+
+    scratch = f'{out_dir}.{uuid.uuid4().hex}.tmp'
+    os.makedirs(scratch)
+    try:
+        with Image.open(image_path) as source:
+            img = source.copy() if source.mode in ('L', 'RGB') else source.convert('RGB')
+        width, height = img.size
+
+        preview = img.copy()
+        preview.thumbnail((PREVIEW_WIDTH, height))
+        _save_jpeg(preview, os.path.join(scratch, 'preview.jpg'))
+
+        level_count = max(0, math.ceil(math.log2(max(width, height) / TILE_SIZE))) + 1
+        sizes = []
+        level_img = img
+        for level in reversed(range(level_count)):
+            level_dir = os.path.join(scratch, str(level))
+            os.makedirs(level_dir)
+            w, h = level_img.size
+            for y in range(0, h, TILE_SIZE):
+                for x in range(0, w, TILE_SIZE):
+                    tile = level_img.crop((x, y, min(x + TILE_SIZE, w), min(y + TILE_SIZE, h)))
+                    _save_jpeg(tile, os.path.join(level_dir, f'{x // TILE_SIZE}_{y // TILE_SIZE}.jpg'))
+            sizes.append([w, h])
+            if level:
+                level_img = level_img.reduce(2)
+        sizes.reverse()
+
+        info = {'width': width, 'height': height, 'tile_size': TILE_SIZE, 'levels': sizes}
+        with open(os.path.join(scratch, 'info.json'), 'w', encoding='utf-8') as f:
+            json.dump(info, f)
+
+        if os.path.exists(out_dir):
+            shutil.rmtree(out_dir, ignore_errors=True)
+        try:
+            os.replace(scratch, out_dir)
+        except OSError:
+            # Another worker finished the same pyramid first
+            shutil.rmtree(scratch, ignore_errors=True)
+        return info
+    except Exception:
+        shutil.rmtree(scratch, ignore_errors=True)
+        raise
+
+
+def _read_info(info_path, image_path):
+    """Cached pyramid info, or None if missing or older than the page image"""
+    try:
+        if os.path.getmtime(info_path) < os.path.getmtime(image_path):
+            return None
+        with open(info_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def ensure_pyramid(page_id, image_path):
+    """Return the pyramid info for a page, building the tiles on first use"""
+    info_path = os.path.join(tile_dir(page_id), 'info.json')
+    info = _read_info(info_path, image_path)
+    if info is not None:
+        return info
+    with _build_locks_guard:
+        lock = _build_locks.setdefault(str(page_id), Lock())
+    with lock:
+        info = _read_info(info_path, image_path)
+        if info is None:
+            os.makedirs(TILES_DIR, exist_ok=True)
+            info = build_pyramid(image_path, tile_dir(page_id))
+    return info
+
+
+def pyramid_info(page_id, image_path):
+    """Pyramid info for a page if it is built and up to date, else None"""
+    return _read_info(os.path.join(tile_dir(page_id), 'info.json'), image_path)
+
+
+def start_pyramid_build(page_id, image_path, start_thread):
+    """Build a page's pyramid on a thread started by start_thread, unless one is already running"""
+    page_id = str(page_id)
+    with _build_locks_guard:
+        if page_id in _building:
+            return
+        _building.add(page_id)
+
+    def build():
+        try:
+            ensure_pyramid(page_id, image_path)
+        except Exception as e:
+            print(f"❌ Tile pyramid for page {page_id} failed: {e}")
+        finally:
+            with _build_locks_guard:
+                _building.discard(page_id)
+
+    start_thread(build)
+
+
+def remove_pyramid(page_id):
+    shutil.rmtree(tile_dir(page_id), ignore_errors=True)